@@ -18,7 +18,7 @@ from visualizer import Visualizer
 from customer import Customer
 from phoneline import PhoneLine
 from contract import PrepaidContract, MTMContract, TermContract
-from call import Call
+from call import Call, Drawable
 
 
 def import_data() -> Dict[str, List[Dict]]:
@@ -129,9 +129,8 @@ def process_event_history(log: Dict[str, List[Dict]],
             bil_date = datetime.datetime.strptime(event_data['time'],
                                                   "%Y-%m-%d %H:%M:%S")
             calls = Call(event_data["src_number"], event_data["dst_number"],
-                         datetime.date(bil_date.year,
-                                       bil_date.month, bil_date.day)
-                         , event_data["duration"], tuple(event_data["src_loc"]),
+                         bil_date, event_data["duration"],
+                         tuple(event_data["src_loc"]),
                          tuple(event_data["dst_loc"]))
             find_customer_by_number(event_data["src_number"],
                                     customer_list).make_call(calls)
@@ -139,6 +138,19 @@ def process_event_history(log: Dict[str, List[Dict]],
                                     customer_list).receive_call(calls)
 
 
+def calls_to_drawables(calls: List[Call]) -> List[Drawable]:
+    """ Return the drawables displaying the <calls>: the sprites of all calls,
+    followed by their connection lines, so that the lines are on top.
+    """
+    connections = []
+    drawables = []
+    for call in calls:
+        connections.append(call.get_connection())
+        drawables.extend(call.get_drawables())
+    drawables.extend(connections)
+    return drawables
+
+
 if __name__ == '__main__':
     v = Visualizer()
     print("Toronto map coordinates:")
@@ -168,22 +180,21 @@ if __name__ == '__main__':
     # Main loop for the application.
     # 1) Wait for user interaction with the system and processes everything
     #    appropriately
-    # 2) Take the calls from the results of the filtering and create the
-    #    drawables and connection lines for those calls
-    # 3) Display the calls in the visualization window
+    # 2) If the results of the filtering changed, take the calls from them
+    #    and create the drawables and connection lines for those calls
+    # 3) Display the calls in the visualization window, if anything changed
+    # 4) Wait for the next frame
     events = all_calls
+    drawables = None
     while not v.has_quit():
-        events = v.handle_window_events(customers, events)
-
-        connections = []
-        drawables = []
-        for event in events:
-            connections.append(event.get_connection())
-            drawables.extend(event.get_drawables())
-
-        # Put the connections on top of the other sprites
-        drawables.extend(connections)
-        v.render_drawables(drawables)
+        new_events = v.handle_window_events(customers, events)
+
+        if drawables is None or new_events is not events:
+            events = new_events
+            drawables = calls_to_drawables(events)
+        if v.needs_redraw():
+            v.render_drawables(drawables)
+        v.wait_frame()
 
     import python_ta
 
@@ -0,0 +1,588 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import math
+import datetime
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import List, Dict, Tuple, Set, Optional, Iterable, Any
+from call import Call
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+=== Module Description ===
+
+This file contains the CallIndex class, which keeps search structures over a
+list of calls so that the filters can answer repeated queries on the same
+call set without scanning every call.
+
+The structures are built lazily, the first time a query needs them, and are
+reused by every later query on the same list of calls.
+
+The call attributes used by the filters can also be laid out column by
+column (see build_columns), as NumPy arrays when NumPy is installed.
+
+It also contains the Selection class, a bitmap over the positions of the
+calls of a CallIndex, which lets filter results be combined without building
+lists of calls.
+"""
+
+# Target number of endpoints stored in one cell of the endpoint grid
+GRID_CELL_LOAD = 4
+# Maximum number of cells along each axis of the endpoint grid
+GRID_MAX_CELLS = 512
+
+# Number of call lists whose indexes are kept by get_call_index
+INDEX_CACHE_SIZE = 4
+
+# Names of the call attribute columns, and their array type codes. Phone
+# numbers are stored as integer codes, and times as microseconds since the
+# start of year 1.
+COLUMNS = (('duration', 'q'), ('src_x', 'd'), ('src_y', 'd'),
+           ('dst_x', 'd'), ('dst_y', 'd'), ('src_number', 'q'),
+           ('dst_number', 'q'), ('time', 'q'))
+
+
+class _EndpointGrid:
+    """ A uniform grid over the source and destination locations of a list of
+    calls.
+
+    Each cell stores the positions (in the indexed list) of the calls that
+    have at least one endpoint inside that cell.
+    """
+    # === Private attributes ===
+    # _min_x, _min_y:
+    #    the lower left corner of the area covered by the grid
+    # _cell_w, _cell_h:
+    #    the dimensions of a single cell
+    # _cols, _rows:
+    #    the number of cells along each axis
+    # _cells:
+    #    maps (column, row) to the positions of the calls with an endpoint in
+    #    that cell, and the endpoint itself
+    _min_x: float
+    _min_y: float
+    _cell_w: float
+    _cell_h: float
+    _cols: int
+    _rows: int
+    _cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]]
+
+    def __init__(self, calls: List[Call]) -> None:
+        """ Build a grid holding both endpoints of every call in <calls>.
+        """
+        xs = [c.src_loc[0] for c in calls] + [c.dst_loc[0] for c in calls]
+        ys = [c.src_loc[1] for c in calls] + [c.dst_loc[1] for c in calls]
+        self._min_x = min(xs, default=0.0)
+        self._min_y = min(ys, default=0.0)
+        side = max(1, min(GRID_MAX_CELLS,
+                          math.ceil(math.sqrt(len(xs) / GRID_CELL_LOAD))))
+        self._cols = side
+        self._rows = side
+        self._cell_w = (max(xs, default=0.0) - self._min_x) / side or 1.0
+        self._cell_h = (max(ys, default=0.0) - self._min_y) / side or 1.0
+        self._cells = {}
+        for pos, call in enumerate(calls):
+            self.add(pos, call)
+
+    def add(self, pos: int, call: Call) -> None:
+        """ Add both endpoints of <call>, stored at position <pos> of the
+        indexed list, to this grid.
+        """
+        self._insert(pos, call.src_loc)
+        if call.dst_loc != call.src_loc:
+            self._insert(pos, call.dst_loc)
+
+    def _insert(self, pos: int, loc: Tuple[float, float]) -> None:
+        """ Store the endpoint <loc> of the call at position <pos>.
+        """
+        key = (self._column(loc[0]), self._row(loc[1]))
+        if key not in self._cells:
+            self._cells[key] = [(pos, loc[0], loc[1])]
+        else:
+            self._cells[key].append((pos, loc[0], loc[1]))
+
+    def _column(self, x: float) -> int:
+        """ Return the column of the grid containing the longitude <x>.
+        Longitudes outside of the grid are clamped to its border cells.
+        """
+        return min(self._cols - 1,
+                   max(0, int((x - self._min_x) / self._cell_w)))
+
+    def _row(self, y: float) -> int:
+        """ Return the row of the grid containing the latitude <y>.
+        Latitudes outside of the grid are clamped to its border cells.
+        """
+        return min(self._rows - 1,
+                   max(0, int((y - self._min_y) / self._cell_h)))
+
+    def query(self, lower_x: float, lower_y: float,
+              upper_x: float, upper_y: float) -> Set[int]:
+        """ Return the positions of all calls with at least one endpoint in the
+        rectangle with corners (<lower_x>, <lower_y>) and (<upper_x>,
+        <upper_y>). Endpoints on the boundary of the rectangle are included.
+        """
+        found = set()
+        if lower_x > upper_x or lower_y > upper_y:
+            return found
+        first_col = self._column(lower_x)
+        last_col = self._column(upper_x)
+        first_row = self._row(lower_y)
+        last_row = self._row(upper_y)
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self._cells.get((col, row))
+                if cell is None:
+                    continue
+                if first_col < col < last_col and first_row < row < last_row:
+                    # The cell lies strictly inside the rectangle
+                    found.update(pos for pos, _, _ in cell)
+                else:
+                    found.update(pos for pos, x, y in cell
+                                 if lower_x <= x <= upper_x
+                                 and lower_y <= y <= upper_y)
+        return found
+
+
+class CallIndex:
+    """ Search structures over a list of calls.
+
+    Each indexed call is identified by its position in the indexed list.
+    Calls appended to the indexed list after the index was created are picked
+    up by refresh(); any other change to the list requires a new index.
+
+    === Public Attributes ===
+    calls:
+         the indexed list of calls, in its original order
+    uses:
+         the number of predicates which chose their backend for the indexed
+         calls (see Predicate.backend_for)
+    """
+    # === Private attributes ===
+    # _size:
+    #    the number of calls from <calls> that are currently indexed
+    # _grid:
+    #    the grid over the call endpoints, or None if it was not built yet
+    # _durations:
+    #    the (duration, position) pairs of the indexed calls, sorted by
+    #    duration, or None if they were not sorted yet
+    # _by_number:
+    #    maps each phone number to the positions of the calls made or received
+    #    by it, or None if it was not built yet
+    # _times:
+    #    the (time, position) pairs of the indexed calls, sorted by time, or
+    #    None if they were not sorted yet
+    # _columns:
+    #    the NumPy arrays holding the columns of the indexed calls, or None
+    #    if they were not built yet
+    # _number_codes:
+    #    maps each phone number to its code in the number columns
+    calls: List[Call]
+    uses: int
+    _size: int
+    _grid: Optional[_EndpointGrid]
+    _durations: Optional[List[Tuple[int, int]]]
+    _by_number: Optional[Dict[str, List[int]]]
+    _times: Optional[List[Tuple[datetime.datetime, int]]]
+    _columns: Optional[Dict[str, Any]]
+    _number_codes: Dict[str, int]
+
+    def __init__(self, calls: List[Call]) -> None:
+        """ Create an index over <calls>. No search structure is built until a
+        query needs it.
+        """
+        self.calls = calls
+        self.uses = 0
+        self._size = len(calls)
+        self._grid = None
+        self._durations = None
+        self._by_number = None
+        self._times = None
+        self._columns = None
+        self._number_codes = {}
+
+    def __len__(self) -> int:
+        """ Return the number of indexed calls
+        """
+        return self._size
+
+    def refresh(self) -> None:
+        """ Index the calls which were appended to <calls> since the last
+        refresh, updating the search structures which are already built.
+        """
+        for pos in range(self._size, len(self.calls)):
+            self.add_call(self.calls[pos], pos)
+
+    def add_call(self, call: Call, pos: int) -> None:
+        """ Record that <call> is stored at position <pos> of <calls>.
+
+        Precondition: <pos> is the number of calls indexed so far.
+        """
+        if self._grid is not None:
+            self._grid.add(pos, call)
+        if self._durations is not None:
+            insort(self._durations, (int(call.duration), pos))
+        if self._by_number is not None:
+            self._add_numbers(call, pos)
+        if self._times is not None:
+            insort(self._times, (call_datetime(call), pos))
+        # The columns are rebuilt on their next use
+        self._columns = None
+        self._size = pos + 1
+
+    def calls_in_area(self, lower_long: float, lower_lat: float,
+                      upper_long: float, upper_lat: float) -> List[Call]:
+        """ Return the indexed calls whose source or destination lies inside
+        the rectangle defined by the lower left corner (<lower_long>,
+        <lower_lat>) and the upper right corner (<upper_long>, <upper_lat>),
+        in their original order. Calls on the boundary are included.
+        """
+        return self._select(self.positions_in_area(lower_long, lower_lat,
+                                                   upper_long, upper_lat))
+
+    def positions_in_area(self, lower_long: float, lower_lat: float,
+                          upper_long: float, upper_lat: float) -> Set[int]:
+        """ Return the positions of the calls returned by calls_in_area.
+        """
+        if self._grid is None:
+            self._grid = _EndpointGrid(self.calls[:self._size])
+        return self._grid.query(lower_long, lower_lat, upper_long, upper_lat)
+
+    def calls_with_duration(self, lower: Optional[int] = None,
+                            upper: Optional[int] = None) -> List[Call]:
+        """ Return the indexed calls lasting at least <lower> and at most
+        <upper> seconds, in their original order. A bound which is None is
+        not checked.
+        """
+        return self._select(self.positions_with_duration(lower, upper))
+
+    def positions_with_duration(self, lower: Optional[int] = None,
+                                upper: Optional[int] = None) \
+            -> Iterable[int]:
+        """ Return the positions of the calls returned by calls_with_duration.
+        """
+        if self._durations is None:
+            self._durations = sorted(
+                (int(self.calls[pos].duration), pos)
+                for pos in range(self._size))
+        first = 0
+        last = len(self._durations)
+        if lower is not None:
+            first = bisect_left(self._durations, (lower, -1))
+        if upper is not None:
+            last = bisect_right(self._durations, (upper, self._size))
+        return (pos for _, pos in self._durations[first:last])
+
+    def positions_of_numbers(self, numbers: Iterable[str]) -> Set[int]:
+        """ Return the positions of the indexed calls made or received by one
+        of the phone <numbers>.
+        """
+        if self._by_number is None:
+            self._by_number = {}
+            for pos in range(self._size):
+                self._add_numbers(self.calls[pos], pos)
+        positions = set()
+        for number in numbers:
+            positions.update(self._by_number.get(number, []))
+        return positions
+
+    def calls_in_period(self, start: Optional[datetime.datetime] = None,
+                        end: Optional[datetime.datetime] = None) \
+            -> List[Call]:
+        """ Return the indexed calls which took place between <start> and
+        <end>, inclusive, in their original order. A bound which is None is
+        not checked.
+        """
+        return self._select(self.positions_in_period(start, end))
+
+    def positions_in_period(self, start: Optional[datetime.datetime] = None,
+                            end: Optional[datetime.datetime] = None) \
+            -> Iterable[int]:
+        """ Return the positions of the calls returned by calls_in_period.
+        """
+        times = self.time_order()
+        first = 0
+        last = len(times)
+        if start is not None:
+            first = bisect_left(times, (start, -1))
+        if end is not None:
+            last = bisect_right(times, (end, self._size))
+        return (pos for _, pos in times[first:last])
+
+    def time_order(self) -> List[Tuple[datetime.datetime, int]]:
+        """ Return the (time, position) pairs of the indexed calls, sorted by
+        time, then by position.
+
+        The returned list is kept by this index, and must not be changed.
+        """
+        if self._times is None:
+            self._times = sorted((call_datetime(self.calls[pos]), pos)
+                                 for pos in range(self._size))
+        return self._times
+
+    def columns(self) -> Dict[str, Any]:
+        """ Return the columns of the indexed calls as NumPy arrays, keyed by
+        the column names from COLUMNS.
+
+        Precondition: NumPy is installed.
+        """
+        if self._columns is None:
+            columns, self._number_codes = build_columns(
+                self.calls[:self._size])
+            self._columns = {name: numpy.frombuffer(column, column.typecode)
+                             for name, column in columns.items()}
+        return self._columns
+
+    def has_columns(self) -> bool:
+        """ Return True iff the columns returned by columns() are built.
+        """
+        return self._columns is not None
+
+    def number_codes(self) -> Dict[str, int]:
+        """ Return the map from phone numbers to their codes in the columns
+        returned by columns().
+        """
+        self.columns()
+        return self._number_codes
+
+    def subset(self, positions: Any) -> List[Call]:
+        """ Return the list of the indexed calls at <positions>, in the order
+        of <positions>.
+
+        If the columns of this index are built, the index of the returned
+        list starts out with its columns taken from them.
+        """
+        calls = self.calls
+        if numpy is not None and isinstance(positions, numpy.ndarray):
+            result = [calls[pos] for pos in positions.tolist()]
+        else:
+            result = [calls[pos] for pos in positions]
+        if self._columns is not None:
+            child = CallIndex(result)
+            child._columns = {name: column[positions]
+                              for name, column in self._columns.items()}
+            child._number_codes = self._number_codes
+            with _index_lock:
+                _remember(child)
+        return result
+
+    def _add_numbers(self, call: Call, pos: int) -> None:
+        """ Record <pos> as the position of a call made or received by both
+        phone numbers of <call>.
+        """
+        for number in (call.src_number, call.dst_number):
+            if number not in self._by_number:
+                self._by_number[number] = [pos]
+            elif self._by_number[number][-1] != pos:
+                self._by_number[number].append(pos)
+
+    def _select(self, positions: Iterable[int]) -> List[Call]:
+        """ Return the calls stored at <positions>, in their original order.
+        """
+        return [self.calls[pos] for pos in sorted(positions)]
+
+
+class Selection:
+    """ A subset of the calls of a CallIndex, stored as a bitmap with one bit
+    per indexed call: bit i is set iff the call at position i is selected.
+
+    Selections over the same index are combined with the & (and), | (or) and
+    ~ (not) operators, which work on whole machine words at a time. The
+    selected calls are only materialized as a list by calls().
+
+    === Public Attributes ===
+    index:
+         the index whose calls are selected
+    size:
+         the number of indexed calls this selection is defined over
+    mask:
+         the bitmap of the selected positions
+
+    === Representation Invariants ===
+    - 0 <= mask < 2 ** size
+    """
+    index: CallIndex
+    size: int
+    mask: int
+
+    def __init__(self, index: CallIndex, mask: int = 0) -> None:
+        """ Create a selection of the calls of <index> given by the bitmap
+        <mask>.
+        """
+        self.index = index
+        self.size = len(index)
+        self.mask = mask
+
+    @staticmethod
+    def from_positions(index: CallIndex,
+                       positions: Iterable[int]) -> 'Selection':
+        """ Return the selection of the calls of <index> at <positions>.
+        """
+        bits = bytearray((len(index) + 7) // 8)
+        for pos in positions:
+            bits[pos >> 3] |= 1 << (pos & 7)
+        return Selection(index, int.from_bytes(bits, 'little'))
+
+    @staticmethod
+    def everything(index: CallIndex) -> 'Selection':
+        """ Return the selection of all the calls of <index>.
+        """
+        return Selection(index, (1 << len(index)) - 1)
+
+    def _check(self, other: 'Selection') -> None:
+        """ Raise a ValueError if <other> is not defined over the same calls
+        as this selection.
+        """
+        if other.index is not self.index or other.size != self.size:
+            raise ValueError('Selections over different calls')
+
+    def __and__(self, other: 'Selection') -> 'Selection':
+        """ Return the calls selected by both this selection and <other>.
+        """
+        self._check(other)
+        return Selection(self.index, self.mask & other.mask)
+
+    def __or__(self, other: 'Selection') -> 'Selection':
+        """ Return the calls selected by this selection or <other>.
+        """
+        self._check(other)
+        return Selection(self.index, self.mask | other.mask)
+
+    def __invert__(self) -> 'Selection':
+        """ Return the calls not selected by this selection.
+        """
+        return Selection(self.index, self.mask ^ ((1 << self.size) - 1))
+
+    def __len__(self) -> int:
+        """ Return the number of selected calls
+        """
+        return bin(self.mask).count('1')
+
+    def positions(self) -> List[int]:
+        """ Return the selected positions, in increasing order.
+        """
+        result = []
+        bits = self.mask.to_bytes((self.size + 7) // 8, 'little')
+        for byte_pos, byte in enumerate(bits):
+            if byte:
+                base = byte_pos << 3
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        result.append(base + bit)
+        return result
+
+    def calls(self) -> List[Call]:
+        """ Return the selected calls, in their original order.
+        """
+        calls = self.index.calls
+        return [calls[pos] for pos in self.positions()]
+
+
+def build_columns(calls: List[Call]) \
+        -> Tuple[Dict[str, array], Dict[str, int]]:
+    """ Return the columns listed in COLUMNS for <calls>, and the map from
+    each of their phone numbers to its code in the number columns.
+    """
+    codes = {}
+    for call in calls:
+        codes.setdefault(call.src_number, len(codes))
+        codes.setdefault(call.dst_number, len(codes))
+    columns = {
+        'duration': array('q', [int(call.duration) for call in calls]),
+        'src_x': array('d', [call.src_loc[0] for call in calls]),
+        'src_y': array('d', [call.src_loc[1] for call in calls]),
+        'dst_x': array('d', [call.dst_loc[0] for call in calls]),
+        'dst_y': array('d', [call.dst_loc[1] for call in calls]),
+        'src_number': array('q', [codes[call.src_number] for call in calls]),
+        'dst_number': array('q', [codes[call.dst_number] for call in calls]),
+        'time': array('q', [microseconds(call_datetime(call))
+                            for call in calls])
+    }
+    return columns, codes
+
+
+def microseconds(moment: datetime.datetime) -> int:
+    """ Return the number of microseconds from the start of year 1 to
+    <moment>, as stored in the time column.
+    """
+    return (moment - datetime.datetime.min) // \
+        datetime.timedelta(microseconds=1)
+
+
+def call_datetime(call: Call) -> datetime.datetime:
+    """ Return the time of <call> as a datetime. Calls whose time only records
+    the date are considered to take place at midnight.
+    """
+    if isinstance(call.time, datetime.datetime):
+        return call.time
+    return datetime.datetime.combine(call.time, datetime.time())
+
+
+# The indexes returned by get_call_index, least recently used first
+_index_cache = []
+# Guards <_index_cache>, as the filters running in the background look up
+# indexes while the main thread may do so too
+_index_lock = threading.Lock()
+
+
+def get_call_index(calls: List[Call]) -> CallIndex:
+    """ Return an index over the list <calls>, reusing the index built by a
+    previous call with the same list if there is one.
+
+    This may be called from several threads at once.
+    """
+    with _index_lock:
+        for index in _index_cache:
+            if index.calls is calls:
+                _index_cache.remove(index)
+                if len(calls) < len(index):
+                    # Calls were removed from the list since it was indexed
+                    index = CallIndex(calls)
+                else:
+                    index.refresh()
+                break
+        else:
+            index = CallIndex(calls)
+        _remember(index)
+        return index
+
+
+def _remember(index: CallIndex) -> None:
+    """ Record <index> as the most recently used index of get_call_index.
+
+    Precondition: the caller holds <_index_lock>.
+    """
+    for old in _index_cache:
+        if old.calls is index.calls:
+            _index_cache.remove(old)
+            break
+    if len(_index_cache) == INDEX_CACHE_SIZE:
+        _index_cache.pop(0)
+    _index_cache.append(index)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'datetime', 'threading', 'array',
+            'bisect', 'numpy', 'call'
+        ],
+        'disable': ['R0902', 'R0913'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,79 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import datetime
+import random
+from typing import List, Tuple
+import pytest
+from call import Call
+from contract import MTMContract
+from customer import Customer
+from phoneline import PhoneLine
+
+"""
+=== Module Description ===
+
+This file contains the pytest fixtures shared by the tests of the filters: a
+small random dataset of customers and the calls between them.
+"""
+
+# Map corners (long, lat) the call locations are drawn from
+MAP_LOWER = (-79.697878, 43.576959)
+MAP_UPPER = (-79.196382, 43.799568)
+
+
+def make_dataset(seed: int, customer_count: int, call_count: int) \
+        -> Tuple[List[Customer], List[Call]]:
+    """ Return <customer_count> random customers, with one to three phone
+    lines each, and the <call_count> random calls they made, in
+    chronological order.
+
+    The call locations are rounded to 3 decimals, so that many calls share
+    their endpoints, and some lie exactly on the rectangles used by tests.
+    """
+    rng = random.Random(seed)
+    customers = []
+    lines = []
+    for cid in range(customer_count):
+        customer = Customer(1000 + cid)
+        for line in range(rng.randint(1, 3)):
+            number = '{:03d}-{:04d}'.format(cid, line)
+            customer.add_phone_line(
+                PhoneLine(number, MTMContract(datetime.date(2017, 12, 25))))
+            lines.append((number, customer))
+        customers.append(customer)
+    moment = datetime.datetime(2018, 1, 1)
+    calls = []
+    for _ in range(call_count):
+        (src, caller), (dst, callee) = rng.choice(lines), rng.choice(lines)
+        moment += datetime.timedelta(seconds=rng.randint(1, 3600))
+        call = Call(src, dst, moment, rng.randint(1, 600),
+                    _random_location(rng), _random_location(rng))
+        caller.make_call(call)
+        callee.receive_call(call)
+        calls.append(call)
+    return customers, calls
+
+
+def _random_location(rng: random.Random) -> Tuple[float, float]:
+    """ Return a random location on the map, rounded to 3 decimals.
+    """
+    return (round(rng.uniform(MAP_LOWER[0], MAP_UPPER[0]), 3),
+            round(rng.uniform(MAP_LOWER[1], MAP_UPPER[1]), 3))
+
+
+@pytest.fixture
+def dataset() -> Tuple[List[Customer], List[Call]]:
+    """ Return the customers and the calls of a small random dataset.
+    """
+    return make_dataset(0, 30, 2000)
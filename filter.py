@@ -13,9 +13,11 @@ Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import time
 import datetime
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 from call import Call
 from customer import Customer
+from predicates import Predicate, DurationPredicate, AreaPredicate, \
+    NumbersPredicate, PeriodPredicate, AndPredicate, OrPredicate, NotPredicate
 
 
 class Filter:
@@ -48,6 +50,23 @@ class Filter:
         """
         raise NotImplementedError
 
+    def compile(self, customers: List[Customer],
+                filter_string: str) -> Optional[Predicate]:
+        """ Return the predicate that selects the same calls as this filter
+        with the <filter_string>, parsing the <filter_string> only once.
+
+        Return None if this filter cannot be compiled into a predicate, or if
+        the <filter_string> is invalid.
+        """
+        return None
+
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of <filter_string>: two filter strings with
+        the same canonical form select the same calls with this filter.
+        Every invalid filter string has the empty string as canonical form.
+        """
+        return filter_string
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
@@ -77,6 +96,12 @@ class ResetFilter(Filter):
             filtered_calls.extend(customer_history[0])
         return filtered_calls
 
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of <filter_string>, which is ignored by
+        this filter.
+        """
+        return ''
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
@@ -102,22 +127,30 @@ class CustomerFilter(Filter):
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
         """
-        id_list = []
-        for cus in customers:
-            id_list.append(int(cus.get_id()))
-        if not filter_string.isdigit():
-            return data
-        if int(filter_string) not in id_list:
+        predicate = self.compile(customers, filter_string)
+        if predicate is None:
             return data
-        pl = []
-        for cust in customers:
-            if int(filter_string) == int(cust.get_id()):
-                pl = cust.get_phone_numbers()
-        c = []
-        for calls in data:
-            if (calls.src_number in pl) or (calls.dst_number in pl):
-                c.append(calls)
-        return c
+        return predicate.apply(data)
+
+    def compile(self, customers: List[Customer],
+                filter_string: str) -> Optional[Predicate]:
+        """ Return a predicate for the calls made or received by the customer
+        with the id specified in <filter_string>, or None if the
+        <filter_string> is invalid.
+        """
+        if not filter_string.isdigit():
+            return None
+        numbers = _phone_numbers_of(customers, int(filter_string))
+        if numbers is None:
+            return None
+        return NumbersPredicate(numbers)
+
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of the customer id in <filter_string>.
+        """
+        if not filter_string.isdigit():
+            return ''
+        return str(int(filter_string))
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
@@ -139,37 +172,44 @@ class DurationFilter(Filter):
 
         The <customers> list contains all customers from the input dataset.
 
-        The filter string is valid if and only if it contains the following
-        input format: either "Lxxx" or "Gxxx", indicating to filter calls less
-        than xxx or g1reater than xxx seconds, respectively.
+        The filter string is valid if and only if it contains one of the
+        following input formats: either "Lxxx" or "Gxxx", indicating to filter
+        calls less than xxx or g1reater than xxx seconds, respectively, or
+        "xxx-yyy", indicating to filter calls lasting between xxx and yyy
+        seconds, inclusive.
         - If the filter string is invalid, return the original list <data>
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
         """
-        if len(filter_string) == 0:
-            return data
-        if filter_string[0] != 'L' and filter_string[0] != 'G':
+        predicate = self.compile(customers, filter_string)
+        if predicate is None:
             return data
-        if not filter_string[1:].isdigit():
-            return data
-        required_duration = int(filter_string[1:])
-        c = []
-        for calls in data:
-            if filter_string[0] == 'L':
-                if int(calls.duration) < required_duration:
-                    c.append(calls)
-            elif filter_string[0] == 'G':
-                if int(calls.duration) > required_duration:
-                    c.append(calls)
-            else:
-                return data
-        return c
+        return predicate.apply(data)
+
+    def compile(self, customers: List[Customer],
+                filter_string: str) -> Optional[Predicate]:
+        """ Return a predicate for the calls with a duration in the range given
+        by <filter_string>, or None if the <filter_string> is invalid.
+        """
+        duration_range = _parse_duration(filter_string)
+        if duration_range is None:
+            return None
+        return DurationPredicate(*duration_range)
+
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of the duration range in <filter_string>.
+        """
+        duration_range = _parse_duration(filter_string)
+        if duration_range is None:
+            return ''
+        return repr(duration_range)
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
         return "Filter calls based on duration; " \
-               "L### returns calls less than specified length, G### for greater"
+               "L### returns calls less than specified length, G### for " \
+               "greater, ###-### for calls within a range"
 
 
 class LocationFilter(Filter):
@@ -200,50 +240,29 @@ class LocationFilter(Filter):
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
         """
-        if filter_string == "":
-            return data
-        help_list0 = filter_string.split(',')
-        if len(help_list0) != 4:
+        predicate = self.compile(customers, filter_string)
+        if predicate is None:
             return data
-        for j in help_list0[1:]:
-            if j[0] != ' ':
-                return data
-        help_list = []
-        for dat in help_list0:
-            help_list.append(dat.strip())
-        if len(help_list) != 4:
-            return data
-        for dat in help_list:
-            if dat[0] == '-':
-                dat = dat[1:]
-            da = dat.split('.')
-            if len(da) > 2:
-                return data
-            for i in da:
-                if not i.isdigit():
-                    return data
-        if (float(help_list[0]) < -79.697878) or \
-                (float(help_list[2]) > -79.196382) or \
-                (float(help_list[1]) < 43.576959) or \
-                (float(help_list[3]) > 43.799568):
-            return data
-        c = []
-        for calls in data:
-            if float(help_list[0]) <= float(calls.src_loc[0]) \
-                    <= float(help_list[2]) \
-                    and float(help_list[1])\
-                    <= calls.src_loc[1] \
-                    <= float(help_list[3]):
-                c.append(calls)
-            elif float(help_list[0]) <= float(calls.dst_loc[0]) \
-                    <= float(help_list[2]) \
-                    and (float(help_list[1])
-                         <= calls.dst_loc[1]
-                         <= float(help_list[3])):
-                c.append(calls)
-            else:
-                pass
-        return c
+        return predicate.apply(data)
+
+    def compile(self, customers: List[Customer],
+                filter_string: str) -> Optional[Predicate]:
+        """ Return a predicate for the calls which took place within the
+        location specified by <filter_string>, or None if the <filter_string>
+        is invalid.
+        """
+        bounds = _parse_location(filter_string)
+        if bounds is None:
+            return None
+        return AreaPredicate(*bounds)
+
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of the rectangle in <filter_string>.
+        """
+        bounds = _parse_location(filter_string)
+        if bounds is None:
+            return ''
+        return repr(bounds)
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
@@ -253,11 +272,282 @@ class LocationFilter(Filter):
                "upperLong, upperLat\" (e.g., -79.6, 43.6, -79.3, 43.7)"
 
 
+class DateRangeFilter(Filter):
+    """
+    A class for selecting only the calls that took place within a given
+    period of time.
+    """
+    def apply(self, customers: List[Customer],
+              data: List[Call],
+              filter_string: str) \
+            -> List[Call]:
+        """ Return a list of all calls from <data> which took place within the
+        period specified by the <filter_string>.
+
+        The <customers> list contains all customers from the input dataset.
+
+        The filter string is valid if and only if it contains the start and
+        the end of the period, separated by a comma and a space:
+          start, end
+        each of them either a date ("YYYY-MM-DD") or a date and a time
+        ("YYYY-MM-DD HH:MM" or "YYYY-MM-DD HH:MM:SS"), with the start not
+        after the end. Both ends of the period are included; an end given as
+        a date includes the whole day.
+        - If the filter string is invalid, return the original list <data>
+        - If the filter string is invalid, your code must not crash, as
+        specified in the handout.
+        """
+        predicate = self.compile(customers, filter_string)
+        if predicate is None:
+            return data
+        return predicate.apply(data)
+
+    def compile(self, customers: List[Customer],
+                filter_string: str) -> Optional[Predicate]:
+        """ Return a predicate for the calls which took place within the period
+        specified by <filter_string>, or None if the <filter_string> is
+        invalid.
+        """
+        period = _parse_period(filter_string)
+        if period is None:
+            return None
+        return PeriodPredicate(*period)
+
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of the period in <filter_string>.
+        """
+        period = _parse_period(filter_string)
+        if period is None:
+            return ''
+        return repr(period)
+
+    def __str__(self) -> str:
+        """ Return a description of this filter to be displayed in the UI menu
+        """
+        return "Filter calls made in a given period. Format: \"start, end\" " \
+               "(e.g., 2018-01-01, 2018-01-07 or " \
+               "2018-01-01 08:00, 2018-01-01 18:00)"
+
+
+class ExpressionFilter(Filter):
+    """
+    A class for combining the customer, duration, location and date range
+    filters with AND, OR and NOT.
+    """
+    def apply(self, customers: List[Customer],
+              data: List[Call],
+              filter_string: str) \
+            -> List[Call]:
+        """ Return a list of all calls from <data> which match the filter
+        expression in <filter_string>.
+
+        The <customers> list contains all customers from the input dataset.
+
+        The filter string is valid if and only if it is an expression made of
+        terms combined with "&" (and) and "|" (or), where "&" binds tighter
+        than "|". Each term is one of the filter keys "c", "d", "l" or "t",
+        followed by a space and a valid filter string for that filter,
+        optionally preceded by "!" (not). For example:
+          c 5716 | !d L60 & l -79.6, 43.6, -79.3, 43.7
+        - If the filter string is invalid, return the original list <data>
+        - If the filter string is invalid, your code must not crash, as
+        specified in the handout.
+        """
+        predicate = self.compile(customers, filter_string)
+        if predicate is None:
+            return data
+        return predicate.apply(data)
+
+    def compile(self, customers: List[Customer],
+                filter_string: str) -> Optional[Predicate]:
+        """ Return a predicate for the calls which match the filter expression
+        in <filter_string>, or None if the <filter_string> is invalid.
+        """
+        expression = _parse_expression(filter_string)
+        if expression is None:
+            return None
+        disjuncts = []
+        for conjunction in expression:
+            conjuncts = []
+            for negated, f, term in conjunction:
+                predicate = f.compile(customers, term)
+                if predicate is None:
+                    return None
+                conjuncts.append(NotPredicate(predicate) if negated
+                                 else predicate)
+            disjuncts.append(conjuncts[0] if len(conjuncts) == 1
+                             else AndPredicate(conjuncts))
+        return disjuncts[0] if len(disjuncts) == 1 else OrPredicate(disjuncts)
+
+    def normalize(self, filter_string: str) -> str:
+        """ Return a canonical form of the filter expression in
+        <filter_string>.
+        """
+        expression = _parse_expression(filter_string)
+        if expression is None:
+            return ''
+        return ' | '.join(
+            ' & '.join(('!' if negated else '') + _key_of(f) + ' ' +
+                       f.normalize(term) for negated, f, term in conjunction)
+            for conjunction in expression)
+
+    def __str__(self) -> str:
+        """ Return a description of this filter to be displayed in the UI menu
+        """
+        return "Combine filters with & (and), | (or) and ! (not), " \
+               "e.g., c 5716 | !d L60"
+
+
+# The filters which can be used in the terms of a filter expression
+EXPRESSION_FILTERS = {'c': CustomerFilter, 'd': DurationFilter,
+                      'l': LocationFilter, 't': DateRangeFilter}
+
+
+def _key_of(f: Filter) -> str:
+    """ Return the key of the filter <f> in a filter expression.
+    """
+    for key, filter_class in EXPRESSION_FILTERS.items():
+        if isinstance(f, filter_class):
+            return key
+    raise ValueError('No expression key for ' + type(f).__name__)
+
+
+def _phone_numbers_of(customers: List[Customer],
+                      cid: int) -> Optional[List[str]]:
+    """ Return the phone numbers of the customer with the id <cid> in
+    <customers>, or None if there is no such customer.
+
+    The customers are searched again for every filter compiled, so that the
+    numbers always match their current phone lines; this costs one pass over
+    the customers, while the calls are found through the CallIndex.
+    """
+    for cust in customers:
+        if int(cust.get_id()) == cid:
+            return cust.get_phone_numbers()
+    return None
+
+
+def _parse_expression(filter_string: str) \
+        -> Optional[List[List[Tuple[bool, Filter, str]]]]:
+    """ Return the filter expression in <filter_string> as a list of
+    conjunctions, which are OR-ed together, each being a list of
+    (negated, filter, filter string) terms which are AND-ed together.
+    Return None if the <filter_string> is invalid.
+    """
+    expression = []
+    for disjunct in filter_string.split('|'):
+        conjunction = []
+        for term in disjunct.split('&'):
+            term = term.strip()
+            negated = term.startswith('!')
+            if negated:
+                term = term[1:].lstrip()
+            if len(term) < 2 or term[1] != ' ' or \
+                    term[0] not in EXPRESSION_FILTERS:
+                return None
+            f = EXPRESSION_FILTERS[term[0]]()
+            term = term[2:].strip()
+            if f.normalize(term) == '':
+                return None
+            conjunction.append((negated, f, term))
+        expression.append(conjunction)
+    return expression
+
+
+def _parse_period(filter_string: str) \
+        -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+    """ Return the first and the last moment of the period specified in the
+    date range <filter_string>, or None if the <filter_string> is invalid.
+    """
+    bounds = filter_string.split(', ')
+    if len(bounds) != 2:
+        return None
+    start = _parse_moment(bounds[0].strip())
+    end = _parse_moment(bounds[1].strip())
+    if start is None or end is None:
+        return None
+    if len(bounds[1].strip()) == len('YYYY-MM-DD'):
+        # The end of the period is the end of that day
+        end = end + datetime.timedelta(days=1, microseconds=-1)
+    if start > end:
+        return None
+    return start, end
+
+
+def _parse_moment(moment: str) -> Optional[datetime.datetime]:
+    """ Return the date, or date and time, specified in <moment>, or None if
+    <moment> is not in one of the formats accepted by DateRangeFilter.
+    """
+    for moment_format in ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(moment, moment_format)
+        except ValueError:
+            pass
+    return None
+
+
+def _parse_duration(filter_string: str) \
+        -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """ Return the shortest and the longest call duration, in seconds, matched
+    by the duration <filter_string>, or None if the <filter_string> is
+    invalid. A duration which is not limited is returned as None.
+    """
+    if len(filter_string) == 0:
+        return None
+    if filter_string[0] == 'L' and filter_string[1:].isdigit():
+        return None, int(filter_string[1:]) - 1
+    if filter_string[0] == 'G' and filter_string[1:].isdigit():
+        return int(filter_string[1:]) + 1, None
+    bounds = filter_string.split('-')
+    if len(bounds) != 2 or not bounds[0].strip().isdigit() \
+            or not bounds[1].strip().isdigit():
+        return None
+    lower, upper = int(bounds[0]), int(bounds[1])
+    if lower > upper:
+        return None
+    return lower, upper
+
+
+def _parse_location(filter_string: str) \
+        -> Optional[Tuple[float, float, float, float]]:
+    """ Return the lowerLong, lowerLat, upperLong and upperLat coordinates
+    specified in the location <filter_string>, or None if the <filter_string>
+    is invalid or the rectangle is not within the map boundaries.
+    """
+    if filter_string == "":
+        return None
+    help_list0 = filter_string.split(',')
+    if len(help_list0) != 4:
+        return None
+    for j in help_list0[1:]:
+        if j == '' or j[0] != ' ':
+            return None
+    help_list = []
+    for dat in help_list0:
+        help_list.append(dat.strip())
+    for dat in help_list:
+        if dat != '' and dat[0] == '-':
+            dat = dat[1:]
+        da = dat.split('.')
+        if len(da) > 2:
+            return None
+        for i in da:
+            if not i.isdigit():
+                return None
+    bounds = (float(help_list[0]), float(help_list[1]),
+              float(help_list[2]), float(help_list[3]))
+    if (bounds[0] < -79.697878) or (bounds[2] > -79.196382) or \
+            (bounds[1] < 43.576959) or (bounds[3] > 43.799568):
+        return None
+    return bounds
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer'
+            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer',
+            'predicates'
         ],
         'max-nested-blocks': 4,
         'allowed-io': ['apply', '__str__'],
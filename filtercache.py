@@ -0,0 +1,169 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import sys
+from collections import OrderedDict
+from typing import List, Tuple, Callable, Optional, Any
+from call import Call
+from customer import Customer
+from filter import Filter, ResetFilter
+
+"""
+=== Module Description ===
+
+This file contains the FilterCache class, a bounded least-recently-used cache
+of filter results.
+
+A result is looked up by the type of the filter, the canonical form of the
+filter string (see Filter.normalize) and a version stamp of the input call
+set. Call sets are treated as immutable, except that calls may be appended
+to them, which changes their version stamp.
+"""
+
+# Default memory budget of a FilterCache, in bytes
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FilterCache:
+    """ A least-recently-used cache of filter results, evicting the oldest
+    results once their estimated memory use exceeds <max_bytes>.
+
+    Only the lists of results are accounted for, since the calls themselves
+    are shared with the input dataset.
+
+    === Public Attributes ===
+    max_bytes:
+         the memory budget for the cached results, in bytes
+    hits:
+         the number of filters answered from this cache
+    misses:
+         the number of filters which had to be computed
+    """
+    # === Private attributes ===
+    # _entries:
+    #    maps each cache key to the input of the filter (kept to pin its
+    #    version stamp), the result, and the estimated size of the result;
+    #    the least recently used entry comes first
+    # _size:
+    #    the total estimated size of the cached results, in bytes
+    max_bytes: int
+    hits: int
+    misses: int
+    _entries: 'OrderedDict[Tuple[str, str, Tuple[int, int]], ' \
+              'Tuple[Any, List[Call], int]]'
+    _size: int
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        """ Create an empty cache holding at most <max_bytes> of results.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def apply(self, f: Filter, customers: List[Customer], data: List[Call],
+              filter_string: str,
+              apply_filter: Optional[Callable[[Filter, List[Customer],
+                                               List[Call], str],
+                                              List[Call]]] = None) \
+            -> List[Call]:
+        """ Return the result of applying the filter <f> with <filter_string>
+        to <data>, computing it with <apply_filter>, or with f.apply if
+        <apply_filter> is None, only if it is not cached.
+
+        The returned list is shared with the cache and must not be changed.
+        """
+        result = self.lookup(f, customers, data, filter_string)
+        if result is not None:
+            return result
+        if apply_filter is None:
+            result = f.apply(customers, data, filter_string)
+        else:
+            result = apply_filter(f, customers, data, filter_string)
+        self.store(f, customers, data, filter_string, result)
+        return result
+
+    def lookup(self, f: Filter, customers: List[Customer], data: List[Call],
+               filter_string: str) -> Optional[List[Call]]:
+        """ Return the cached result of applying the filter <f> with
+        <filter_string> to <data>, or None if it is not cached.
+
+        The returned list is shared with the cache and must not be changed.
+        """
+        source, key = _key(f, customers, data, filter_string)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is source:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def store(self, f: Filter, customers: List[Customer], data: List[Call],
+              filter_string: str, result: List[Call]) -> None:
+        """ Cache <result> as the result of applying the filter <f> with
+        <filter_string> to <data>.
+        """
+        source, key = _key(f, customers, data, filter_string)
+        self._store(key, source, result)
+
+    def _store(self, key: Tuple[str, str, Tuple[int, int]], source: Any,
+               result: List[Call]) -> None:
+        """ Cache <result> under <key>, for the filter input <source>, and
+        evict the least recently used results which exceed the memory budget.
+        """
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[2]
+        size = sys.getsizeof(result)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (source, result, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, _, old_size) = self._entries.popitem(last=False)
+            self._size -= old_size
+
+    def clear(self) -> None:
+        """ Remove all results from this cache.
+        """
+        self._entries.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        """ Return the number of cached results
+        """
+        return len(self._entries)
+
+
+def _key(f: Filter, customers: List[Customer], data: List[Call],
+         filter_string: str) -> Tuple[Any, Tuple[str, str, Tuple[int, int]]]:
+    """ Return the input of the filter <f> applied with <filter_string> to
+    <data>, and the key of its result in a FilterCache.
+    """
+    # A reset ignores the current call set, and only depends on customers
+    source = customers if isinstance(f, ResetFilter) else data
+    return source, (type(f).__name__, f.normalize(filter_string),
+                    (id(source), len(source)))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'sys', 'collections',
+            'call', 'customer', 'filter'
+        ],
+        'disable': ['R0913'],
+        'generated-members': 'pygame.*'
+    })
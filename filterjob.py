@@ -0,0 +1,168 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import time
+import threading
+from typing import List, Optional
+from call import Call
+from customer import Customer
+from filter import Filter
+from filterpool import FilterPool
+
+"""
+=== Module Description ===
+
+This file contains the FilterJob class, which applies a filter in a
+background thread, so that the visualization stays responsive while a slow
+filter runs.
+
+The calls are scanned chunk by chunk (see FilterPool.chunks): the job reports
+its progress after every chunk, and stops at the next chunk once it is
+cancelled.
+"""
+
+
+class FilterJob:
+    """ A filter being applied to a call set in a background thread.
+
+    === Public Attributes ===
+    f:
+         the filter being applied
+    filter_string:
+         the filter string the filter is applied with
+    data:
+         the calls being filtered
+    elapsed:
+         the time taken by the filter in seconds, once it is done
+    """
+    # === Private attributes ===
+    # _customers:
+    #    all customers from the input dataset
+    # _pool:
+    #    the filter pool scanning the calls
+    # _cancelled:
+    #    set once this job is cancelled
+    # _scanned:
+    #    the number of calls from <data> scanned so far
+    # _result:
+    #    the calls matching the filter, or None if the job is not done
+    # _error:
+    #    the exception raised by the filter, or None if there is none
+    # _thread:
+    #    the thread running the filter
+    f: Filter
+    filter_string: str
+    data: List[Call]
+    elapsed: float
+    _customers: List[Customer]
+    _pool: FilterPool
+    _cancelled: threading.Event
+    _scanned: int
+    _result: Optional[List[Call]]
+    _error: Optional[Exception]
+    _thread: threading.Thread
+
+    def __init__(self, f: Filter, customers: List[Customer],
+                 data: List[Call], filter_string: str,
+                 pool: FilterPool) -> None:
+        """ Start applying the filter <f> with <filter_string> to <data>,
+        scanning the calls with <pool>.
+        """
+        self.f = f
+        self.filter_string = filter_string
+        self.data = data
+        self.elapsed = 0.0
+        self._customers = customers
+        self._pool = pool
+        self._cancelled = threading.Event()
+        self._scanned = 0
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def progress(self) -> float:
+        """ Return the fraction of the calls scanned so far, between 0 and 1.
+        """
+        if self.done() or len(self.data) == 0:
+            return 1.0
+        return self._scanned / len(self.data)
+
+    def done(self) -> bool:
+        """ Return True iff the filter has finished, was cancelled or failed.
+        """
+        return not self._thread.is_alive()
+
+    def cancel(self) -> None:
+        """ Stop the filter once the chunk being scanned is done.
+        """
+        self._cancelled.set()
+
+    def cancelled(self) -> bool:
+        """ Return True iff this job was cancelled.
+        """
+        return self._cancelled.is_set()
+
+    def wait(self) -> None:
+        """ Wait until the filter has finished, was cancelled or failed.
+        """
+        self._thread.join()
+
+    def result(self) -> List[Call]:
+        """ Return the calls from <data> matching the filter, re-raising the
+        exception raised by the filter if it failed.
+
+        Precondition: this job is done and was not cancelled.
+        """
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self) -> None:
+        """ Apply the filter, scanning the calls chunk by chunk until this job
+        is done or cancelled.
+        """
+        start = time.time()
+        try:
+            predicate = self.f.compile(self._customers, self.filter_string)
+            if predicate is None:
+                result = self.f.apply(self._customers, self.data,
+                                      self.filter_string)
+            else:
+                result = []
+                chunks = self._pool.chunks(predicate, self.data)
+                try:
+                    for matches, scanned in chunks:
+                        if self._cancelled.is_set():
+                            return
+                        result.extend(matches)
+                        self._scanned = scanned
+                finally:
+                    chunks.close()
+            self._result = result
+        except Exception as error:
+            # Reported to the caller of result()
+            self._error = error
+        self.elapsed = time.time() - start
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'time', 'threading',
+            'call', 'customer', 'filter', 'filterpool'
+        ],
+        'disable': ['R0902', 'R0913', 'W0703'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,292 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Dict, Tuple, Optional, Iterator, Any
+from call import Call
+from callindex import COLUMNS, get_call_index, numpy
+from customer import Customer
+from filter import Filter
+from predicates import Predicate
+
+"""
+=== Module Description ===
+
+This file contains the FilterPool class, which applies filters to large call
+sets with a pool of worker processes.
+
+The NumPy columns of a call set (see CallIndex.columns) are copied once into
+a block of shared memory. Each worker wraps a range of rows of these columns
+in NumPy arrays, without copying them, and returns the positions of the
+matching calls, which are merged back in their original order. The filters
+are compiled into predicates (see Filter.compile), which are sent to the
+workers and checked against the columns with Predicate.mask.
+
+The worker processes are started by a fork server where available, and are
+spawned otherwise, so that they never inherit the threads or the windows of
+the visualizer.
+"""
+
+# Call sets smaller than this are filtered in this process
+PARALLEL_MIN_CALLS = 100000
+# Number of chunks handed to each worker process for one filter
+CHUNKS_PER_WORKER = 4
+# Number of calls in each chunk of a call set scanned in this process
+LOCAL_CHUNK_SIZE = 20000
+# Size in bytes of a single column entry
+ITEM_SIZE = 8
+
+
+class CallColumns:
+    """ The attributes of a list of calls stored column by column in a block of
+    shared memory.
+
+    Phone numbers are stored as integer codes; <number_codes> maps each phone
+    number to its code.
+
+    === Public Attributes ===
+    calls:
+         the list of calls stored in the columns
+    size:
+         the number of stored calls
+    number_codes:
+         maps each phone number of the stored calls to its integer code
+    shm:
+         the shared memory block holding the columns
+    """
+    calls: List[Call]
+    size: int
+    number_codes: Dict[str, int]
+    shm: SharedMemory
+
+    def __init__(self, calls: List[Call]) -> None:
+        """ Copy the columns of the index of <calls> into a new shared memory
+        block.
+
+        Precondition: NumPy is installed.
+        """
+        index = get_call_index(calls)
+        columns = index.columns()
+        self.calls = calls
+        self.size = len(index)
+        self.number_codes = index.number_codes()
+        self.shm = SharedMemory(
+            create=True, size=max(1, len(COLUMNS) * self.size * ITEM_SIZE))
+        for i, (name, _) in enumerate(COLUMNS):
+            start = i * self.size * ITEM_SIZE
+            self.shm.buf[start:start + self.size * ITEM_SIZE] = \
+                columns[name].tobytes()
+
+    def release(self) -> None:
+        """ Free the shared memory block holding these columns.
+        """
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FilterPool:
+    """ Applies filters to call sets, scanning large call sets in parallel in
+    a pool of worker processes sized to the number of cores.
+
+    Filters which cannot be compiled into a predicate (see Filter.compile)
+    are applied directly in this process.
+
+    === Public Attributes ===
+    workers:
+         the number of worker processes used for parallel filtering
+    """
+    # === Private attributes ===
+    # _executor:
+    #    the pool of worker processes, or None if there are none
+    # _columns:
+    #    the columns of the call set which was filtered in parallel most
+    #    recently, or None if there is none
+    workers: int
+    _executor: Optional[ProcessPoolExecutor]
+    _columns: Optional[CallColumns]
+
+    def __init__(self, workers: Optional[int] = None) -> None:
+        """ Create a filter pool using <workers> processes, or one process per
+        core if <workers> is None.
+
+        The pool is created here, so that it is created by the thread which
+        creates this FilterPool; its processes are started on first use.
+        There are no processes if <workers> is less than 2 or NumPy is not
+        installed.
+        """
+        self.workers = workers if workers is not None else \
+            (os.cpu_count() or 1)
+        self._executor = None
+        if self.workers >= 2 and numpy is not None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=_worker_context())
+        self._columns = None
+
+    def apply(self, f: Filter, customers: List[Customer], data: List[Call],
+              filter_string: str) -> List[Call]:
+        """ Return the calls from <data> which match the filter <f> with the
+        <filter_string>, exactly as f.apply(customers, data, filter_string)
+        would.
+        """
+        if self._executor is None or len(data) < PARALLEL_MIN_CALLS:
+            return f.apply(customers, data, filter_string)
+        predicate = f.compile(customers, filter_string)
+        if predicate is None:
+            return f.apply(customers, data, filter_string)
+
+        result = []
+        for matches, _ in self.chunks(predicate, data):
+            result.extend(matches)
+        return result
+
+    def chunks(self, predicate: Predicate, data: List[Call]) \
+            -> Iterator[Tuple[List[Call], int]]:
+        """ Yield the calls from <data> which satisfy the <predicate>, one
+        chunk of <data> at a time and in their original order, each together
+        with the number of calls of <data> scanned so far.
+
+        The backend is chosen by Predicate.backend_for. The 'index' backend
+        finds the calls in a single chunk. With the 'numpy' backend, large
+        call sets are scanned in parallel by the worker processes, and closing
+        the iterator early cancels the chunks not scanned yet. Other call sets
+        are scanned in this process.
+        """
+        backend = predicate.backend_for(data)
+        if backend == 'index':
+            yield predicate.apply(data, backend), len(data)
+            return
+        if backend != 'numpy' or self._executor is None or \
+                len(data) < PARALLEL_MIN_CALLS:
+            yield from _local_chunks(predicate, data, backend)
+            return
+
+        columns = self._get_columns(data)
+        predicate = predicate.bind(columns.number_codes)
+        chunk_size = math.ceil(columns.size /
+                               (self.workers * CHUNKS_PER_WORKER))
+        futures = []
+        for start in range(0, columns.size, chunk_size):
+            stop = min(start + chunk_size, columns.size)
+            futures.append((self._executor.submit(_scan_chunk,
+                                                  columns.shm.name,
+                                                  columns.size, predicate,
+                                                  start, stop), stop))
+        try:
+            for future, stop in futures:
+                yield [data[pos] for pos in future.result().tolist()], stop
+        finally:
+            for future, _ in futures:
+                future.cancel()
+
+    def _get_columns(self, data: List[Call]) -> CallColumns:
+        """ Return the columns of <data>, reusing the columns of the previous
+        parallel filter if it was applied to the same call set.
+        """
+        if self._columns is not None:
+            if self._columns.calls is data and \
+                    self._columns.size == len(data):
+                return self._columns
+            self._columns.release()
+        self._columns = CallColumns(data)
+        return self._columns
+
+    def close(self) -> None:
+        """ Stop the worker processes and free the shared memory used by this
+        pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._columns is not None:
+            self._columns.release()
+            self._columns = None
+
+
+def _local_chunks(predicate: Predicate, data: List[Call], backend: str) \
+        -> Iterator[Tuple[List[Call], int]]:
+    """ Yield the calls from <data> which satisfy the <predicate>, one chunk
+    of LOCAL_CHUNK_SIZE calls at a time, together with the number of calls of
+    <data> scanned so far, scanning the NumPy columns if <backend> is 'numpy'
+    and the calls themselves otherwise.
+    """
+    if backend == 'numpy':
+        index = get_call_index(data)
+        columns = index.columns()
+        predicate = predicate.bind(index.number_codes())
+    for start in range(0, len(data), LOCAL_CHUNK_SIZE):
+        stop = min(start + LOCAL_CHUNK_SIZE, len(data))
+        if backend == 'numpy':
+            mask = predicate.mask({name: column[start:stop]
+                                   for name, column in columns.items()})
+            yield [data[start + pos] for pos in numpy.flatnonzero(mask)], stop
+        else:
+            yield predicate.filter_calls(data[start:stop]), stop
+
+
+# The shared memory block most recently attached by this worker process
+_attached = []
+
+
+def _attach(name: str) -> SharedMemory:
+    """ Return the shared memory block called <name>, attaching to it if it is
+    not the block this worker process attached to most recently.
+    """
+    if _attached and _attached[0].name == name:
+        return _attached[0]
+    if _attached:
+        _attached.pop().close()
+    _attached.append(SharedMemory(name=name))
+    return _attached[0]
+
+
+def _scan_chunk(shm_name: str, size: int, predicate: Predicate,
+                start: int, stop: int) -> Any:
+    """ Return the positions from <start> to <stop> of the calls stored in the
+    shared memory block <shm_name>, holding <size> calls, which satisfy the
+    <predicate>, as a NumPy array.
+
+    This function runs in the worker processes.
+    """
+    shm = _attach(shm_name)
+    columns = {}
+    for i, (column, typecode) in enumerate(COLUMNS):
+        columns[column] = numpy.frombuffer(
+            shm.buf, typecode, stop - start,
+            (i * size + start) * ITEM_SIZE)
+    return numpy.flatnonzero(predicate.mask(columns)) + start
+
+
+def _worker_context() -> Any:
+    """ Return the multiprocessing context starting the worker processes: a
+    fork server where available, and spawning otherwise.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'math', 'multiprocessing',
+            'concurrent.futures', 'multiprocessing.shared_memory', 'call',
+            'callindex', 'customer', 'filter', 'predicates', 'numpy'
+        ],
+        'disable': ['R0902', 'R0913'],
+        'generated-members': 'pygame.*'
+    })
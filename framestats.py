@@ -0,0 +1,158 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import json
+import time
+from collections import deque
+from typing import List, Dict, Optional
+
+"""
+=== Module Description ===
+
+This file contains the FrameStats class, which keeps rolling timing
+statistics of the frames drawn by the Visualizer, split into stages, and of
+the filters it applies.
+"""
+
+# Number of recent frames and filters the statistics are computed over
+STATS_WINDOW = 120
+
+# The stages of a frame, in the order they run
+STAGES = ('events', 'view', 'objects', 'flip')
+
+
+class FrameStats:
+    """ Rolling timing statistics of recent frames and filters.
+
+    A frame runs from start_frame() to end_frame(); the time spent in each of
+    its STAGES is added with add(). A frame which is started again before it
+    is ended is dropped, so that the frames which draw nothing are left out.
+
+    === Public Attributes ===
+    window:
+         the number of recent frames and filters kept
+    """
+    # === Private attributes ===
+    # _frames:
+    #    for each stage, and for the whole frame under 'frame', the times in
+    #    seconds of the recent frames
+    # _current:
+    #    the time in seconds spent so far in each stage of the frame in
+    #    progress
+    # _frame_start:
+    #    the time the frame in progress started at, or None if no frame is in
+    #    progress
+    # _filters:
+    #    the time in seconds and the number of resulting calls of the recent
+    #    filters
+    window: int
+    _frames: Dict[str, deque]
+    _current: Dict[str, float]
+    _frame_start: Optional[float]
+    _filters: deque
+
+    def __init__(self, window: int = STATS_WINDOW) -> None:
+        """ Create empty statistics over the last <window> frames and filters.
+        """
+        self.window = window
+        self._frames = {stage: deque(maxlen=window)
+                        for stage in STAGES + ('frame',)}
+        self._current = {}
+        self._frame_start = None
+        self._filters = deque(maxlen=window)
+
+    def start_frame(self) -> None:
+        """ Start timing a new frame, dropping the frame in progress, if any.
+        """
+        self._frame_start = time.perf_counter()
+        self._current = {stage: 0.0 for stage in STAGES}
+
+    def add(self, stage: str, seconds: float) -> None:
+        """ Add <seconds> to the time spent in <stage> by the frame in
+        progress.
+        """
+        if self._frame_start is not None:
+            self._current[stage] += seconds
+
+    def end_frame(self) -> None:
+        """ Finish timing the frame in progress, if any.
+        """
+        if self._frame_start is None:
+            return
+        for stage in STAGES:
+            self._frames[stage].append(self._current[stage])
+        self._frames['frame'].append(time.perf_counter() - self._frame_start)
+        self._frame_start = None
+
+    def record_filter(self, seconds: float, size: int) -> None:
+        """ Record a filter which took <seconds> and resulted in <size> calls.
+        """
+        self._filters.append((seconds, size))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """ Return the mean and the maximum time in milliseconds of each stage
+        and of the whole frame over the recent frames, and the same for the
+        recent filters under 'filter', along with the size of the last
+        filter result.
+        """
+        result = {}
+        for stage, times in self._frames.items():
+            result[stage] = _describe(list(times))
+        result['filter'] = _describe([seconds for seconds, _ in self._filters])
+        result['filter']['last_size'] = \
+            self._filters[-1][1] if self._filters else 0
+        return result
+
+    def lines(self) -> List[str]:
+        """ Return the summary of these statistics as lines of text.
+        """
+        summary = self.summary()
+        lines = ['{:<8}{:>7.1f} ms avg{:>7.1f} ms max'.format(
+            stage, summary[stage]['mean_ms'], summary[stage]['max_ms'])
+                 for stage in STAGES + ('frame', 'filter')]
+        lines.append('last filter result: {} calls'.format(
+            summary['filter']['last_size']))
+        return lines
+
+    def export(self, filename: str) -> None:
+        """ Save the summary and the recent frame and filter times to the JSON
+        file <filename>.
+        """
+        data = {'summary': self.summary(),
+                'frames': {stage: list(times)
+                           for stage, times in self._frames.items()},
+                'filters': [list(item) for item in self._filters]}
+        with open(filename, 'w') as output:
+            json.dump(data, output, indent=2)
+
+
+def _describe(times: List[float]) -> Dict[str, float]:
+    """ Return the number, the mean and the maximum in milliseconds of
+    <times>, given in seconds.
+    """
+    if not times:
+        return {'count': 0, 'mean_ms': 0.0, 'max_ms': 0.0}
+    return {'count': len(times),
+            'mean_ms': sum(times) / len(times) * 1000,
+            'max_ms': max(times) * 1000}
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'json', 'time', 'collections'
+        ],
+        'allowed-io': ['export'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,138 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import math
+from typing import List, Dict, Tuple, Iterable
+import pygame
+
+"""
+=== Module Description ===
+
+This file contains the LineBatch class, which merges the connection lines of
+many calls into distinct segments, and the draw_segments function, which
+draws segments with as few pygame calls as possible.
+
+Calls between the same two locations share one segment, drawn once, with a
+width growing with the number of calls along it.
+"""
+
+# Widest line drawn for a segment shared by many calls, in pixels
+MAX_LINE_WIDTH = 4
+
+# A point, as (x, y) or (long, lat)
+Point = Tuple[float, float]
+
+
+class LineBatch:
+    """ The distinct segments of a list of lines, each weighted by the number
+    of lines along it. A segment and its reverse are the same segment.
+
+    === Public Attributes ===
+    segments:
+         the distinct segments, as (start, end) pairs, in the order of the
+         first line along each of them
+    counts:
+         the number of lines along each segment
+    """
+    segments: List[Tuple[Point, Point]]
+    counts: List[int]
+
+    def __init__(self, lines: Iterable[Tuple[Point, Point]]) -> None:
+        """ Merge the <lines>, given as (start, end) pairs, into segments.
+        """
+        self.segments = []
+        self.counts = []
+        positions: Dict[Tuple[Point, Point], int] = {}
+        for start, end in lines:
+            key = (start, end) if start <= end else (end, start)
+            pos = positions.get(key)
+            if pos is None:
+                positions[key] = len(self.segments)
+                self.segments.append((start, end))
+                self.counts.append(1)
+            else:
+                self.counts[pos] += 1
+
+    def __len__(self) -> int:
+        """ Return the number of distinct segments.
+        """
+        return len(self.segments)
+
+    def width(self, segment: int) -> int:
+        """ Return the width in pixels of the line drawn for the segment at
+        position <segment>: one pixel for a single line, and one more pixel
+        each time the number of lines doubles, up to MAX_LINE_WIDTH.
+        """
+        return min(MAX_LINE_WIDTH, 1 + int(math.log2(self.counts[segment])))
+
+
+def draw_segments(surface: pygame.Surface, colour: Tuple[int, int, int],
+                  segments: List[Tuple[Point, Point, int]]) -> None:
+    """ Draw the <segments>, given as (start, end, width) in pixels, onto
+    the <surface>.
+
+    Segments of the same width sharing endpoints are chained into polylines,
+    each drawn with a single pygame call. Segments one pixel wide are
+    anti-aliased.
+    """
+    by_width: Dict[int, List[Tuple[Point, Point]]] = {}
+    for start, end, width in segments:
+        by_width.setdefault(width, []).append((tuple(start), tuple(end)))
+    for width in sorted(by_width):
+        for trail in chain_segments(by_width[width]):
+            if width == 1:
+                pygame.draw.aalines(surface, colour, False, trail)
+            else:
+                pygame.draw.lines(surface, colour, False, trail, width)
+
+
+def chain_segments(segments: List[Tuple[Point, Point]]) -> List[List[Point]]:
+    """ Return the <segments> chained into trails: lists of points in which
+    every two consecutive points are the ends of one of the <segments>. Each
+    segment is in exactly one trail.
+    """
+    ends: Dict[Point, List[int]] = {}
+    for pos, (start, end) in enumerate(segments):
+        ends.setdefault(start, []).append(pos)
+        ends.setdefault(end, []).append(pos)
+    used = [False] * len(segments)
+    trails = []
+    for pos, (start, end) in enumerate(segments):
+        if used[pos]:
+            continue
+        used[pos] = True
+        trail = [start, end]
+        # Extend the trail from its last point while an unused segment
+        # starts or ends there
+        candidates = ends[end]
+        while candidates:
+            following = candidates.pop()
+            if used[following]:
+                continue
+            used[following] = True
+            first, second = segments[following]
+            point = second if first == trail[-1] else first
+            trail.append(point)
+            candidates = ends[point]
+        trails.append(trail)
+    return trails
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'pygame'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,170 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import os
+import sys
+from typing import List, Tuple, Optional, Iterable
+import pygame
+from call import Call
+from customer import Customer
+from filter import CustomerFilter
+from visualizer import Map, SCREEN_SIZE, MAP_MIN, MAP_MAX
+from application import import_data, create_customers, \
+    process_event_history, calls_to_drawables
+
+"""
+=== Module Description ===
+
+This file contains the MapExporter class, which renders maps of call sets
+offscreen and saves them as image files, without a display server: pygame
+runs on the SDL dummy video driver, and no Tk window is opened.
+
+Run this module to export the map of all calls and the maps of the calls of
+the busiest customers from the dataset into a directory:
+    python mapexport.py [output directory]
+"""
+
+# A long/lat rectangle, as (lower long, lower lat, upper long, upper lat)
+Region = Tuple[float, float, float, float]
+
+# The whole map
+WHOLE_MAP = (MAP_MIN[0], MAP_MAX[1], MAP_MAX[0], MAP_MIN[1])
+# Directory the maps are exported to when none is given
+EXPORT_DIR = 'exports'
+# Number of customers with the most calls whose maps are exported
+BUSIEST_CUSTOMERS = 10
+
+
+class MapExporter:
+    """ Renders maps of call sets onto an offscreen surface, and saves them as
+    image files.
+
+    === Public Attributes ===
+    screensize:
+         the size in pixels of the exported maps
+    """
+    # === Private attributes ===
+    # _map:
+    #    the map rendering the calls, shared by all exported maps
+    # _surface:
+    #    the offscreen surface the maps are rendered onto
+    screensize: Tuple[int, int]
+    _map: Map
+    _surface: pygame.Surface
+
+    def __init__(self, screensize: Tuple[int, int] = SCREEN_SIZE) -> None:
+        """ Create an exporter of maps of size <screensize>, starting pygame
+        without a display if it is not started yet.
+        """
+        if not pygame.display.get_init():
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            pygame.display.init()
+        if pygame.display.get_surface() is None:
+            # Lets the map images be converted to a fast pixel format
+            pygame.display.set_mode((1, 1))
+        self.screensize = screensize
+        self._map = Map(screensize)
+        self._surface = pygame.Surface(screensize)
+
+    def render(self, calls: List[Call],
+               region: Optional[Region] = None) -> pygame.Surface:
+        """ Return the map of the <calls> within <region>, or within the whole
+        map if <region> is None.
+
+        The returned surface is reused by the next map rendered.
+        """
+        self._map.show_region(*(region or WHOLE_MAP))
+        self._surface.blit(self._map.get_current_view(), (0, 0))
+        self._map.render_objects(calls_to_drawables(calls), self._surface)
+        return self._surface
+
+    def export(self, calls: List[Call], filename: str,
+               region: Optional[Region] = None) -> None:
+        """ Save the map of the <calls> within <region>, or within the whole
+        map if <region> is None, to the image file <filename>. The image
+        format is chosen by the extension of <filename>.
+        """
+        pygame.image.save(self.render(calls, region), filename)
+
+    def export_all(self, maps: Iterable[Tuple[str, List[Call],
+                                              Optional[Region]]]) -> int:
+        """ Save each of the <maps>, given as (filename, calls, region), and
+        return the number of saved maps.
+        """
+        count = 0
+        for filename, calls, region in maps:
+            self.export(calls, filename, region)
+            count += 1
+        return count
+
+
+def busiest_customers(customers: List[Customer],
+                      count: int) -> List[Customer]:
+    """ Return the <count> customers from <customers> who made or received
+    the most calls, busiest first.
+    """
+    def calls_of(cust: Customer) -> int:
+        """ Return the number of calls made or received by <cust>.
+        """
+        outgoing, incoming = cust.get_history()
+        return len(outgoing) + len(incoming)
+    return sorted(customers, key=calls_of, reverse=True)[:count]
+
+
+def region_of(calls: List[Call]) -> Optional[Region]:
+    """ Return the smallest rectangle containing both ends of all <calls>, or
+    None if there are no calls.
+    """
+    if len(calls) == 0:
+        return None
+    longs = [loc[0] for call in calls for loc in (call.src_loc, call.dst_loc)]
+    lats = [loc[1] for call in calls for loc in (call.src_loc, call.dst_loc)]
+    return min(longs), min(lats), max(longs), max(lats)
+
+
+def export_report(customers: List[Customer], directory: str) -> int:
+    """ Save the map of all calls of the <customers>, and the maps of the
+    calls of the busiest of them, each showing the region of their calls, as
+    PNG files into <directory>. Return the number of saved maps.
+    """
+    os.makedirs(directory, exist_ok=True)
+    all_calls = []
+    for cust in customers:
+        all_calls.extend(cust.get_history()[0])
+
+    maps = [(os.path.join(directory, 'all_calls.png'), all_calls, None)]
+    for cust in busiest_customers(customers, BUSIEST_CUSTOMERS):
+        calls = CustomerFilter().apply(customers, all_calls,
+                                       str(cust.get_id()))
+        maps.append((os.path.join(directory,
+                                  'customer_{}.png'.format(cust.get_id())),
+                     calls, region_of(calls)))
+    return MapExporter().export_all(maps)
+
+
+if __name__ == '__main__':
+    input_dictionary = import_data()
+    customer_list = create_customers(input_dictionary)
+    process_event_history(input_dictionary, customer_list)
+    saved = export_report(customer_list,
+                          sys.argv[1] if len(sys.argv) > 1 else EXPORT_DIR)
+    print("Saved", saved, "maps")
+
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'sys', 'pygame',
+            'call', 'customer', 'filter', 'visualizer', 'application'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,311 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import os
+import math
+import queue
+import threading
+from collections import OrderedDict
+from typing import Tuple, List, Dict, Optional
+import pygame
+
+"""
+=== Module Description ===
+
+This file contains the MapPyramid class, which keeps the map image pre-scaled
+to every zoom level reached with the mouse wheel, cut into tiles, so that the
+view of the map at those zoom levels is only cropped from the tiles instead
+of scaled from the full image.
+
+Only the tiles a view needs are built, by scaling the part of the map they
+cover. They are saved to an on-disk cache by a background thread, so that
+each tile is scaled only once without the view waiting for the disk, and at
+most TILE_CACHE_SIZE tiles are kept in memory: the others are loaded from the
+disk again when the view needs them.
+"""
+
+# Difference between two consecutive zoom levels of the pyramid, which is the
+# zoom step of the mouse wheel
+ZOOM_STEP = 0.1
+# Width and height of a tile in pixels
+TILE_SIZE = 256
+# Number of tiles kept in memory
+TILE_CACHE_SIZE = 192
+# Number of pixels of a level scaled around the tiles being built, so that
+# their edges are smoothed with the neighbouring pixels of the map
+TILE_MARGIN = 2
+# Directory of the on-disk tile cache, relative to this file
+MAP_CACHE_DIR = 'data/map_cache'
+
+
+class MapPyramid:
+    """ The map image scaled to the zoom levels ZOOM_STEP apart, each level
+    cut into square tiles.
+
+    At zoom level z, the whole map is scaled to z times the screen size, and
+    the view is the part of it starting at the pan offset of the map,
+    converted to the pixels of the scaled map.
+
+    === Public Attributes ===
+    image:
+         the full-resolution map image
+    screensize:
+         the size of the screen the views are shown on
+    cache_dir:
+         the directory the tiles are saved to, or None if they are not saved
+    """
+    # === Private attributes ===
+    # _stamp:
+    #    identifies the map image file in the names of the saved tiles, so
+    #    that the tiles of an older image are not used
+    # _tiles:
+    #    the tiles kept in memory, keyed by (level size, column, row), least
+    #    recently used first
+    # _to_write:
+    #    the (file name, tile) pairs waiting to be saved to the disk cache
+    # _writer:
+    #    the thread saving the tiles of <_to_write>, or None if it is not
+    #    started yet
+    image: pygame.Surface
+    screensize: Tuple[int, int]
+    cache_dir: Optional[str]
+    _stamp: str
+    _tiles: OrderedDict
+    _to_write: queue.Queue
+    _writer: Optional[threading.Thread]
+
+    def __init__(self, image: pygame.Surface, image_file: str,
+                 screensize: Tuple[int, int],
+                 cache_dir: Optional[str] = os.path.join(
+                     os.path.dirname(__file__), MAP_CACHE_DIR)) -> None:
+        """ Create a pyramid of the map <image>, loaded from <image_file>, for
+        a screen of size <screensize>, saving its tiles to <cache_dir> unless
+        it is None.
+        """
+        self.image = image
+        self.screensize = screensize
+        self.cache_dir = cache_dir
+        self._stamp = '{}_{}'.format(int(os.path.getmtime(image_file)),
+                                     os.path.getsize(image_file))
+        self._tiles = OrderedDict()
+        self._to_write = queue.Queue()
+        self._writer = None
+
+    def view(self, zoom: float, xoffset: int, yoffset: int) -> pygame.Surface:
+        """ Return the view of the map at <zoom>, panned to the offsets
+        (<xoffset>, <yoffset>) in pixels of the full image, scaled to the
+        screen size.
+
+        A zoom on a level of the pyramid is cropped from that level. Any
+        other zoom is cropped from the next level up, and scaled down.
+        """
+        level_zoom, level_size = self._level(zoom)
+        size = (min(level_size[0],
+                    round(self.screensize[0] * level_zoom / zoom)),
+                min(level_size[1],
+                    round(self.screensize[1] * level_zoom / zoom)))
+        left = min(level_size[0] - size[0],
+                   round(xoffset * level_size[0] / self.image.get_width()))
+        top = min(level_size[1] - size[1],
+                  round(yoffset * level_size[1] / self.image.get_height()))
+        view = self._crop(level_size, left, top, size)
+        if size != self.screensize:
+            view = pygame.transform.smoothscale(view, self.screensize)
+        return view
+
+    def whole(self, zoom: float) -> pygame.Surface:
+        """ Return the whole map at <zoom>, that is, scaled to <zoom> times
+        the screen size.
+
+        It is assembled from the tiles of a level of the pyramid, as view
+        does for a part of the map.
+        """
+        level_zoom, level_size = self._level(zoom)
+        whole = self._crop(level_size, 0, 0, level_size)
+        if level_zoom != zoom:
+            whole = pygame.transform.smoothscale(
+                whole, (round(self.screensize[0] * zoom),
+                        round(self.screensize[1] * zoom)))
+        return whole
+
+    def _level(self, zoom: float) -> Tuple[float, Tuple[int, int]]:
+        """ Return the zoom and the size of the level of the pyramid views at
+        <zoom> are cropped from: the level at <zoom>, or the next one up.
+        """
+        level = round(zoom / ZOOM_STEP)
+        if abs(level * ZOOM_STEP - zoom) > 1e-6:
+            level = math.ceil(zoom / ZOOM_STEP)
+        level_zoom = level * ZOOM_STEP
+        return level_zoom, (round(self.screensize[0] * level_zoom),
+                            round(self.screensize[1] * level_zoom))
+
+    def _crop(self, level_size: Tuple[int, int], left: int, top: int,
+              size: Tuple[int, int]) -> pygame.Surface:
+        """ Return the part of size <size> at (<left>, <top>) of the level of
+        size <level_size>, building the tiles it covers which are missing.
+        """
+        tiles = {}
+        missing = []
+        for col in range(left // TILE_SIZE,
+                         (left + size[0] - 1) // TILE_SIZE + 1):
+            for row in range(top // TILE_SIZE,
+                             (top + size[1] - 1) // TILE_SIZE + 1):
+                key = (level_size, col, row)
+                tiles[key] = self._tile(key)
+                if tiles[key] is None:
+                    missing.append(key)
+        if missing:
+            tiles.update(self._build_tiles(level_size, missing))
+
+        crop = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            crop = crop.convert()
+        for (_, col, row), tile in tiles.items():
+            crop.blit(tile, (col * TILE_SIZE - left, row * TILE_SIZE - top))
+        return crop
+
+    def _tile(self, key: Tuple[Tuple[int, int], int, int]) \
+            -> Optional[pygame.Surface]:
+        """ Return the tile with <key> from memory or from the disk, or None
+        if it is not built yet.
+        """
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        filename = self._tile_file(key)
+        if filename is None or not os.path.exists(filename):
+            return None
+        try:
+            tile = pygame.image.load(filename)
+        except pygame.error:
+            return None
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        self._remember(key, tile)
+        return tile
+
+    def _build_tiles(self, level_size: Tuple[int, int],
+                     keys: List[Tuple[Tuple[int, int], int, int]]) \
+            -> Dict[Tuple[Tuple[int, int], int, int], pygame.Surface]:
+        """ Build the tiles with <keys> of the level of size <level_size>,
+        keep them in memory, queue them to be saved to the disk cache, and
+        return them by key.
+
+        Only the part of the map covering these tiles is scaled, along with
+        a margin of TILE_MARGIN pixels of the level so that the edges of the
+        tiles are smoothed as they would be within the whole level.
+        """
+        image_width, image_height = self.image.get_size()
+        ratio_x = image_width / level_size[0]
+        ratio_y = image_height / level_size[1]
+        cols = [col for _, col, _ in keys]
+        rows = [row for _, _, row in keys]
+        # The area of the map to scale, in pixels of the full image
+        area_left = max(0, math.floor(
+            (min(cols) * TILE_SIZE - TILE_MARGIN) * ratio_x))
+        area_top = max(0, math.floor(
+            (min(rows) * TILE_SIZE - TILE_MARGIN) * ratio_y))
+        area_right = min(image_width, math.ceil(
+            ((max(cols) + 1) * TILE_SIZE + TILE_MARGIN) * ratio_x))
+        area_bottom = min(image_height, math.ceil(
+            ((max(rows) + 1) * TILE_SIZE + TILE_MARGIN) * ratio_y))
+        scaled = pygame.transform.smoothscale(
+            self.image.subsurface(area_left, area_top, area_right - area_left,
+                                  area_bottom - area_top),
+            (max(1, round((area_right - area_left) / ratio_x)),
+             max(1, round((area_bottom - area_top) / ratio_y))))
+        # The position of the scaled area in pixels of the level
+        origin_x = round(area_left / ratio_x)
+        origin_y = round(area_top / ratio_y)
+
+        tiles = {}
+        for key in keys:
+            _, col, row = key
+            tile = pygame.Surface(
+                (min(TILE_SIZE, level_size[0] - col * TILE_SIZE),
+                 min(TILE_SIZE, level_size[1] - row * TILE_SIZE)))
+            if pygame.display.get_surface() is not None:
+                tile = tile.convert()
+            tile.blit(scaled, (origin_x - col * TILE_SIZE,
+                               origin_y - row * TILE_SIZE))
+            self._save(key, tile)
+            self._remember(key, tile)
+            tiles[key] = tile
+        return tiles
+
+    def _save(self, key: Tuple[Tuple[int, int], int, int],
+              tile: pygame.Surface) -> None:
+        """ Queue the <tile> with <key> to be saved to the disk cache by the
+        writer thread, starting the thread if needed.
+        """
+        filename = self._tile_file(key)
+        if filename is None:
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_tiles,
+                                            daemon=True)
+            self._writer.start()
+        self._to_write.put((filename, tile))
+
+    def _write_tiles(self) -> None:
+        """ Save the tiles queued by _save to the disk cache, one after the
+        other, for as long as the program runs. The disk cache is turned off
+        if it cannot be written to.
+
+        Each tile is written to a temporary file first, so that a tile is
+        never loaded from a file which is still being written.
+        """
+        while True:
+            filename, tile = self._to_write.get()
+            if self.cache_dir is None:
+                continue
+            partial = filename + '.part.png'
+            try:
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                pygame.image.save(tile, partial)
+                os.replace(partial, filename)
+            except (OSError, pygame.error):
+                self.cache_dir = None
+
+    def _remember(self, key: Tuple[Tuple[int, int], int, int],
+                  tile: pygame.Surface) -> None:
+        """ Keep the <tile> with <key> in memory, dropping the least recently
+        used tile if there are too many.
+        """
+        self._tiles[key] = tile
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > TILE_CACHE_SIZE:
+            self._tiles.popitem(last=False)
+
+    def _tile_file(self, key: Tuple[Tuple[int, int], int, int]) \
+            -> Optional[str]:
+        """ Return the name of the file the tile with <key> is saved to, or
+        None if the tiles are not saved.
+        """
+        if self.cache_dir is None:
+            return None
+        (width, height), col, row = key
+        return os.path.join(self.cache_dir, '{}_{}x{}_{}_{}.png'.format(
+            self._stamp, width, height, col, row))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'math', 'queue', 'threading',
+            'collections', 'pygame'
+        ],
+        'generated-members': 'pygame.*'
+    })
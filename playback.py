@@ -0,0 +1,174 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import datetime
+from bisect import bisect_right
+from typing import List, Tuple
+import pygame
+from call import Call
+from callindex import get_call_index
+
+"""
+=== Module Description ===
+
+This file contains the Playback class, which plays a list of calls back in
+chronological order, keeping a sliding window of the most recent calls, and
+the FadingLayer class, a transparent surface the calls are drawn onto as they
+start, and which fades them out as they leave the window.
+
+Each frame of a playback only handles the calls which started since the
+previous frame: the calls are read from the time order kept by the call
+index, and the calls leaving the window are faded out with the whole layer,
+so the cost of a frame does not grow with the number of calls shown.
+"""
+
+# Seconds of call time played per second, by default
+DEFAULT_SPEED = 6 * 3600
+# Seconds of call time during which a call stays shown, by default
+DEFAULT_WINDOW = 24 * 3600
+# Number of age groups the shown calls are drawn in when a layer is redrawn
+FADE_BANDS = 8
+
+
+class Playback:
+    """ A chronological playback of a list of calls.
+
+    The playback clock starts at the time of the first call. A call is shown
+    from its time until <window> seconds of call time later.
+
+    === Public Attributes ===
+    speed:
+         the number of seconds of call time played per second
+    window:
+         the number of seconds of call time during which a call is shown
+    now:
+         the call time reached by the playback
+    """
+    # === Private attributes ===
+    # _calls:
+    #    the calls being played back, in their original order
+    # _order:
+    #    the (time, position) pairs of <_calls>, sorted by time
+    # _head:
+    #    the position in <_order> of the next call to start
+    # _tail:
+    #    the position in <_order> of the oldest call still shown
+    speed: float
+    window: float
+    now: datetime.datetime
+    _calls: List[Call]
+    _order: List[Tuple[datetime.datetime, int]]
+    _head: int
+    _tail: int
+
+    def __init__(self, calls: List[Call], speed: float = DEFAULT_SPEED,
+                 window: float = DEFAULT_WINDOW) -> None:
+        """ Start playing back <calls> at <speed>, showing each call for
+        <window> seconds of call time.
+        """
+        self.speed = speed
+        self.window = window
+        self._calls = calls
+        self._order = list(get_call_index(calls).time_order())
+        self.now = self._order[0][0] if self._order else datetime.datetime.min
+        self._head = 0
+        self._tail = 0
+
+    def advance(self, seconds: float) -> List[Call]:
+        """ Play <seconds> more of the playback, and return the calls which
+        started during that time, in chronological order.
+        """
+        if self.finished():
+            return []
+        self.now += datetime.timedelta(seconds=seconds * self.speed)
+        head = bisect_right(self._order, (self.now, len(self._calls)))
+        started = self._slice(self._head, head)
+        self._head = head
+        expiry = self.now - datetime.timedelta(seconds=self.window)
+        while self._tail < self._head and \
+                self._order[self._tail][0] <= expiry:
+            self._tail += 1
+        return started
+
+    def shown(self) -> List[Call]:
+        """ Return the calls currently shown, in chronological order.
+        """
+        return self._slice(self._tail, self._head)
+
+    def shown_by_age(self, bands: int) -> List[List[Call]]:
+        """ Return the calls currently shown, split into <bands> groups by the
+        time elapsed since they started, oldest group first.
+        """
+        groups = [[] for _ in range(bands)]
+        for moment, pos in self._order[self._tail:self._head]:
+            age = (self.now - moment).total_seconds() / self.window
+            band = min(bands - 1, int(age * bands))
+            groups[bands - 1 - band].append(self._calls[pos])
+        return groups
+
+    def finished(self) -> bool:
+        """ Return True iff every call has started and left the window.
+        """
+        return self._tail == len(self._order)
+
+    def _slice(self, first: int, last: int) -> List[Call]:
+        """ Return the calls from position <first> to position <last>,
+        excluded, of the time order.
+        """
+        return [self._calls[pos] for _, pos in self._order[first:last]]
+
+
+class FadingLayer:
+    """ A transparent surface whose content fades out over time.
+
+    Everything drawn onto the layer at full opacity disappears after a fade
+    of 1 in total.
+
+    === Public Attributes ===
+    surface:
+         the surface of the layer, with per-pixel transparency
+    """
+    # === Private attributes ===
+    # _carry:
+    #    the part of the alpha to remove which is not removed yet, as pixel
+    #    alpha values are whole numbers
+    surface: pygame.Surface
+    _carry: float
+
+    def __init__(self, size: Tuple[int, int]) -> None:
+        """ Create an empty layer of <size> pixels.
+        """
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self._carry = 0.0
+
+    def fade(self, amount: float) -> None:
+        """ Fade out the content of this layer by <amount>, as a fraction of
+        full opacity.
+        """
+        self._carry += amount * 255
+        step = min(255, int(self._carry))
+        if step > 0:
+            self.surface.fill((0, 0, 0, step),
+                              special_flags=pygame.BLEND_RGBA_SUB)
+            self._carry -= step
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'bisect', 'pygame',
+            'call', 'callindex'
+        ],
+        'generated-members': 'pygame.*'
+    })
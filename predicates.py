@@ -0,0 +1,570 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import math
+import datetime
+from typing import List, Dict, Optional, Iterable, Sequence, FrozenSet, Any
+from call import Call
+from callindex import get_call_index, call_datetime, microseconds, \
+    CallIndex, Selection, numpy
+
+"""
+=== Module Description ===
+
+This file contains the Predicate class and its subclasses. A predicate is a
+filter compiled together with a valid filter string (see Filter.compile): it
+holds the parsed filter arguments, so that nothing is parsed or converted
+again while the calls are checked.
+
+A predicate can select calls in three ways, called backends:
+- 'python': a plain loop over the calls
+- 'index': the search structures of the CallIndex of the calls
+- 'numpy': a boolean expression over the NumPy columns of the calls
+
+When no backend is given, the first predicate checked against a list of
+calls uses a plain loop, which costs less than building the search structures
+or the columns of a list which may never be filtered again. Later on, a
+predicate estimated to match few calls, such as the calls of one customer, of
+a narrow duration range or of a small area, is answered by the search
+structures, which only visit the matching calls, and the other predicates
+are checked against every call with DEFAULT_BACKEND.
+"""
+
+# The backend scanning every call for the predicates matching many calls;
+# 'numpy' needs NumPy to be installed
+DEFAULT_BACKEND = 'numpy' if numpy is not None else 'python'
+# Number of calls, evenly spread over a call set, checked to estimate the
+# fraction of the calls matched by a predicate
+SAMPLE_SIZE = 256
+# Largest estimated fraction of matching calls for which the 'index' backend
+# is chosen when no backend is given
+INDEX_MAX_FRACTION = 0.05
+
+
+class Predicate:
+    """ A condition on calls, compiled from a filter and a valid filter string.
+
+    This is an abstract class. Only subclasses should be instantiated.
+    """
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> satisfies this predicate.
+        """
+        raise NotImplementedError
+
+    def filter_calls(self, calls: List[Call]) -> List[Call]:
+        """ Return the calls from <calls> which satisfy this predicate, in
+        their original order.
+        """
+        return [call for call in calls if self.matches(call)]
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> of the calls stored in
+        the <columns> (see callindex.COLUMNS) which satisfy this predicate.
+        """
+        raise NotImplementedError
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return a NumPy boolean array which is True at the positions of the
+        calls stored in the NumPy <columns> which satisfy this predicate.
+        """
+        raise NotImplementedError
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions of the calls of <index> which satisfy this
+        predicate, using the search structures of <index>.
+        """
+        raise NotImplementedError
+
+    def estimate(self, calls: List[Call]) -> float:
+        """ Return the fraction of <calls> estimated to satisfy this
+        predicate, from a sample of SAMPLE_SIZE calls evenly spread over
+        <calls>.
+        """
+        if len(calls) == 0:
+            return 0.0
+        sample = calls[::max(1, len(calls) // SAMPLE_SIZE)]
+        return sum(1 for call in sample if self.matches(call)) / len(sample)
+
+    def selective(self, calls: List[Call]) -> bool:
+        """ Return True iff this predicate is estimated to match at most
+        INDEX_MAX_FRACTION of <calls>.
+        """
+        return self.estimate(calls) <= INDEX_MAX_FRACTION
+
+    def backend_for(self, calls: List[Call]) -> str:
+        """ Return the backend to check <calls> against this predicate with
+        when none is given, and count this use of the index of <calls>.
+
+        The first use of an index chooses 'python', unless the predicate is
+        not selective on <calls> and the columns of the index are already
+        built. Later uses choose 'index' if the predicate is selective on
+        <calls>, and DEFAULT_BACKEND otherwise.
+        """
+        index = get_call_index(calls)
+        index.uses += 1
+        if self.selective(calls):
+            return 'python' if index.uses == 1 else 'index'
+        if index.uses == 1 and not index.has_columns():
+            return 'python'
+        return DEFAULT_BACKEND
+
+    def bind(self, number_codes: Dict[str, int]) -> 'Predicate':
+        """ Return this predicate, ready to be checked against columns whose
+        phone numbers are coded by <number_codes>.
+        """
+        return self
+
+    def apply(self, data: List[Call],
+              backend: Optional[str] = None) -> List[Call]:
+        """ Return the calls from <data> which satisfy this predicate, in
+        their original order, using <backend>, or the backend chosen by
+        backend_for if <backend> is None.
+        """
+        backend = backend or self.backend_for(data)
+        if backend == 'python':
+            return self.filter_calls(data)
+        index = get_call_index(data)
+        if backend == 'numpy':
+            columns = index.columns()
+            predicate = self.bind(index.number_codes())
+            return index.subset(numpy.flatnonzero(predicate.mask(columns)))
+        return index.subset(sorted(self.positions(index)))
+
+
+class DurationPredicate(Predicate):
+    """ Calls lasting at least <lower> and at most <upper> seconds.
+
+    === Public Attributes ===
+    lower:
+         the shortest matching duration, or None if there is no limit
+    upper:
+         the longest matching duration, or None if there is no limit
+    """
+    lower: Optional[int]
+    upper: Optional[int]
+
+    def __init__(self, lower: Optional[int], upper: Optional[int]) -> None:
+        """ Create a predicate for calls lasting between <lower> and <upper>
+        seconds, inclusive.
+        """
+        self.lower = lower
+        self.upper = upper
+
+    def _bounds(self) -> Any:
+        """ Return the bounds of this predicate, with infinite values standing
+        for the missing limits.
+        """
+        return (-math.inf if self.lower is None else self.lower,
+                math.inf if self.upper is None else self.upper)
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> lasts between <lower> and <upper> seconds.
+        """
+        lower, upper = self._bounds()
+        return lower <= call.duration <= upper
+
+    def filter_calls(self, calls: List[Call]) -> List[Call]:
+        """ Return the calls from <calls> lasting between <lower> and <upper>
+        seconds.
+        """
+        lower, upper = self._bounds()
+        return [call for call in calls if lower <= call.duration <= upper]
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls lasting between <lower> and <upper> seconds.
+        """
+        lower, upper = self._bounds()
+        duration = columns['duration']
+        return [pos for pos in range(start, stop)
+                if lower <= duration[pos] <= upper]
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls lasting between <lower> and <upper>
+        seconds.
+        """
+        lower, upper = self._bounds()
+        duration = columns['duration']
+        return (duration >= lower) & (duration <= upper)
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls lasting between
+        <lower> and <upper> seconds.
+        """
+        return index.positions_with_duration(self.lower, self.upper)
+
+
+class AreaPredicate(Predicate):
+    """ Calls whose source or destination lies inside a rectangle, boundary
+    included.
+
+    === Public Attributes ===
+    lower_long, lower_lat:
+         the lower left corner of the rectangle
+    upper_long, upper_lat:
+         the upper right corner of the rectangle
+    """
+    lower_long: float
+    lower_lat: float
+    upper_long: float
+    upper_lat: float
+
+    def __init__(self, lower_long: float, lower_lat: float,
+                 upper_long: float, upper_lat: float) -> None:
+        """ Create a predicate for the rectangle with the lower left corner
+        (<lower_long>, <lower_lat>) and the upper right corner (<upper_long>,
+        <upper_lat>).
+        """
+        self.lower_long = lower_long
+        self.lower_lat = lower_lat
+        self.upper_long = upper_long
+        self.upper_lat = upper_lat
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff the source or the destination of <call> lies inside
+        the rectangle.
+        """
+        return (self.lower_long <= call.src_loc[0] <= self.upper_long and
+                self.lower_lat <= call.src_loc[1] <= self.upper_lat) or \
+            (self.lower_long <= call.dst_loc[0] <= self.upper_long and
+             self.lower_lat <= call.dst_loc[1] <= self.upper_lat)
+
+    def filter_calls(self, calls: List[Call]) -> List[Call]:
+        """ Return the calls from <calls> whose source or destination lies
+        inside the rectangle.
+        """
+        x0, y0 = self.lower_long, self.lower_lat
+        x1, y1 = self.upper_long, self.upper_lat
+        return [call for call in calls
+                if (x0 <= call.src_loc[0] <= x1 and
+                    y0 <= call.src_loc[1] <= y1) or
+                (x0 <= call.dst_loc[0] <= x1 and
+                 y0 <= call.dst_loc[1] <= y1)]
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls whose source or destination lies inside the rectangle.
+        """
+        x0, y0 = self.lower_long, self.lower_lat
+        x1, y1 = self.upper_long, self.upper_lat
+        src_x, src_y = columns['src_x'], columns['src_y']
+        dst_x, dst_y = columns['dst_x'], columns['dst_y']
+        return [pos for pos in range(start, stop)
+                if (x0 <= src_x[pos] <= x1 and y0 <= src_y[pos] <= y1) or
+                (x0 <= dst_x[pos] <= x1 and y0 <= dst_y[pos] <= y1)]
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls whose source or destination lies
+        inside the rectangle.
+        """
+        x0, y0 = self.lower_long, self.lower_lat
+        x1, y1 = self.upper_long, self.upper_lat
+        src_x, src_y = columns['src_x'], columns['src_y']
+        dst_x, dst_y = columns['dst_x'], columns['dst_y']
+        return ((src_x >= x0) & (src_x <= x1) &
+                (src_y >= y0) & (src_y <= y1)) | \
+            ((dst_x >= x0) & (dst_x <= x1) & (dst_y >= y0) & (dst_y <= y1))
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls whose source or
+        destination lies inside the rectangle.
+        """
+        return index.positions_in_area(self.lower_long, self.lower_lat,
+                                       self.upper_long, self.upper_lat)
+
+
+class NumbersPredicate(Predicate):
+    """ Calls made or received by one of a set of phone numbers.
+
+    === Public Attributes ===
+    numbers:
+         the phone numbers
+    codes:
+         the codes of <numbers> in the columns this predicate is bound to, or
+         None if it is not bound to any columns
+    """
+    numbers: FrozenSet[str]
+    codes: Optional[FrozenSet[int]]
+
+    def __init__(self, numbers: Iterable[str],
+                 codes: Optional[FrozenSet[int]] = None) -> None:
+        """ Create a predicate for the calls of the phone <numbers>, whose
+        codes in the columns are <codes>.
+        """
+        self.numbers = frozenset(numbers)
+        self.codes = codes
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> was made or received by one of <numbers>.
+        """
+        return call.src_number in self.numbers or \
+            call.dst_number in self.numbers
+
+    def filter_calls(self, calls: List[Call]) -> List[Call]:
+        """ Return the calls from <calls> made or received by one of
+        <numbers>.
+        """
+        numbers = self.numbers
+        return [call for call in calls
+                if call.src_number in numbers or call.dst_number in numbers]
+
+    def bind(self, number_codes: Dict[str, int]) -> Predicate:
+        """ Return a copy of this predicate holding the codes of <numbers>
+        from <number_codes>.
+        """
+        return NumbersPredicate(self.numbers,
+                                frozenset(number_codes[number]
+                                          for number in self.numbers
+                                          if number in number_codes))
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls made or received by one of <numbers>.
+
+        Precondition: this predicate is bound to <columns>.
+        """
+        codes = self.codes
+        src, dst = columns['src_number'], columns['dst_number']
+        return [pos for pos in range(start, stop)
+                if src[pos] in codes or dst[pos] in codes]
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls made or received by one of <numbers>.
+
+        Precondition: this predicate is bound to <columns>.
+        """
+        codes = numpy.array(sorted(self.codes), dtype=numpy.int64)
+        return numpy.isin(columns['src_number'], codes) | \
+            numpy.isin(columns['dst_number'], codes)
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls made or received by
+        one of <numbers>.
+        """
+        return index.positions_of_numbers(self.numbers)
+
+
+class PeriodPredicate(Predicate):
+    """ Calls which took place within a period of time, both ends included.
+
+    === Public Attributes ===
+    start:
+         the first moment of the period
+    end:
+         the last moment of the period
+    """
+    start: datetime.datetime
+    end: datetime.datetime
+
+    def __init__(self, start: datetime.datetime,
+                 end: datetime.datetime) -> None:
+        """ Create a predicate for the calls from <start> to <end>.
+        """
+        self.start = start
+        self.end = end
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> took place from <start> to <end>.
+        """
+        return self.start <= call_datetime(call) <= self.end
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls which took place within the period.
+        """
+        first, last = microseconds(self.start), microseconds(self.end)
+        moment = columns['time']
+        return [pos for pos in range(start, stop)
+                if first <= moment[pos] <= last]
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls which took place within the period.
+        """
+        moment = columns['time']
+        return (moment >= microseconds(self.start)) & \
+            (moment <= microseconds(self.end))
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls which took place
+        within the period.
+        """
+        return index.positions_in_period(self.start, self.end)
+
+
+class AndPredicate(Predicate):
+    """ Calls satisfying all of a list of predicates.
+
+    === Public Attributes ===
+    parts:
+         the combined predicates
+    """
+    parts: List[Predicate]
+
+    def __init__(self, parts: List[Predicate]) -> None:
+        """ Create the conjunction of the predicates <parts>.
+        """
+        self.parts = parts
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> satisfies all of <parts>.
+        """
+        return all(part.matches(call) for part in self.parts)
+
+    def bind(self, number_codes: Dict[str, int]) -> Predicate:
+        """ Return this predicate with all of <parts> bound to <number_codes>.
+        """
+        return AndPredicate([part.bind(number_codes) for part in self.parts])
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls satisfying all of <parts>.
+        """
+        found = set(self.parts[0].scan(columns, start, stop))
+        for part in self.parts[1:]:
+            found.intersection_update(part.scan(columns, start, stop))
+        return sorted(found)
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls satisfying all of <parts>.
+        """
+        result = self.parts[0].mask(columns)
+        for part in self.parts[1:]:
+            result = result & part.mask(columns)
+        return result
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls satisfying all of
+        <parts>.
+        """
+        result = Selection.everything(index)
+        for part in self.parts:
+            result = result & Selection.from_positions(index,
+                                                       part.positions(index))
+        return result.positions()
+
+
+class OrPredicate(Predicate):
+    """ Calls satisfying at least one of a list of predicates.
+
+    === Public Attributes ===
+    parts:
+         the combined predicates
+    """
+    parts: List[Predicate]
+
+    def __init__(self, parts: List[Predicate]) -> None:
+        """ Create the disjunction of the predicates <parts>.
+        """
+        self.parts = parts
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> satisfies one of <parts>.
+        """
+        return any(part.matches(call) for part in self.parts)
+
+    def bind(self, number_codes: Dict[str, int]) -> Predicate:
+        """ Return this predicate with all of <parts> bound to <number_codes>.
+        """
+        return OrPredicate([part.bind(number_codes) for part in self.parts])
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls satisfying one of <parts>.
+        """
+        found = set()
+        for part in self.parts:
+            found.update(part.scan(columns, start, stop))
+        return sorted(found)
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls satisfying one of <parts>.
+        """
+        result = self.parts[0].mask(columns)
+        for part in self.parts[1:]:
+            result = result | part.mask(columns)
+        return result
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls satisfying one of
+        <parts>.
+        """
+        result = Selection(index)
+        for part in self.parts:
+            result = result | Selection.from_positions(index,
+                                                       part.positions(index))
+        return result.positions()
+
+
+class NotPredicate(Predicate):
+    """ Calls which do not satisfy a predicate.
+
+    === Public Attributes ===
+    part:
+         the negated predicate
+    """
+    part: Predicate
+
+    def __init__(self, part: Predicate) -> None:
+        """ Create the negation of the predicate <part>.
+        """
+        self.part = part
+
+    def matches(self, call: Call) -> bool:
+        """ Return True iff <call> does not satisfy <part>.
+        """
+        return not self.part.matches(call)
+
+    def bind(self, number_codes: Dict[str, int]) -> Predicate:
+        """ Return this predicate with <part> bound to <number_codes>.
+        """
+        return NotPredicate(self.part.bind(number_codes))
+
+    def scan(self, columns: Dict[str, Sequence], start: int,
+             stop: int) -> List[int]:
+        """ Return the positions from <start> to <stop> in <columns> of the
+        calls which do not satisfy <part>.
+        """
+        found = set(self.part.scan(columns, start, stop))
+        return [pos for pos in range(start, stop) if pos not in found]
+
+    def mask(self, columns: Dict[str, Any]) -> Any:
+        """ Return the mask of the calls which do not satisfy <part>.
+        """
+        return ~self.part.mask(columns)
+
+    def positions(self, index: CallIndex) -> Iterable[int]:
+        """ Return the positions in <index> of the calls which do not satisfy
+        <part>.
+        """
+        return (~Selection.from_positions(index,
+                                          self.part.positions(index)))\
+            .positions()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'datetime', 'call', 'callindex'
+        ],
+        'disable': ['R0913'],
+        'generated-members': 'pygame.*'
+    })
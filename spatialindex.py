@@ -0,0 +1,172 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import math
+from typing import List, Dict, Tuple, Optional
+
+"""
+=== Module Description ===
+
+This file contains the LooseQuadtree class, a spatial index over rectangles
+used to find the drawables inside the visible region of the map, and the
+clip_segment function, which cuts a line segment to a rectangle.
+"""
+
+# Number of levels below the root of a LooseQuadtree
+QUADTREE_DEPTH = 7
+
+# A rectangle, as (lower x, lower y, upper x, upper y)
+Box = Tuple[float, float, float, float]
+
+
+class LooseQuadtree:
+    """ A loose quadtree over a list of rectangles, called items.
+
+    Level k of the tree divides the bounds of all items into 2 ** k by 2 ** k
+    cells. Each item is stored once, in the cell containing its centre, at
+    the deepest level whose cells are at least as large as the item. An item
+    thus lies within its cell extended by half a cell on each side, so the
+    tree answers rectangle queries without splitting long items across cells.
+
+    === Public Attributes ===
+    boxes:
+         the rectangles of the items; item i is boxes[i]
+    """
+    # === Private attributes ===
+    # _bounds:
+    #    the bounding rectangle of all items
+    # _levels:
+    #    for each level, maps the (column, row) of each cell to the items
+    #    stored in it
+    boxes: List[Box]
+    _bounds: Box
+    _levels: List[Dict[Tuple[int, int], List[int]]]
+
+    def __init__(self, boxes: List[Box]) -> None:
+        """ Create a quadtree over the rectangles <boxes>.
+        """
+        self.boxes = boxes
+        self._levels = [{} for _ in range(QUADTREE_DEPTH + 1)]
+        if len(boxes) == 0:
+            self._bounds = (0.0, 0.0, 1.0, 1.0)
+            return
+        self._bounds = (min(box[0] for box in boxes),
+                        min(box[1] for box in boxes),
+                        max(box[2] for box in boxes),
+                        max(box[3] for box in boxes))
+        for item, box in enumerate(boxes):
+            self._insert(item, box)
+
+    def _cell_size(self, level: int) -> Tuple[float, float]:
+        """ Return the width and the height of the cells at <level>.
+        """
+        cells = 2 ** level
+        return (max(self._bounds[2] - self._bounds[0], 1e-12) / cells,
+                max(self._bounds[3] - self._bounds[1], 1e-12) / cells)
+
+    def _cell_of(self, level: int, x: float, y: float) -> Tuple[int, int]:
+        """ Return the cell at <level> containing the point (<x>, <y>).
+        """
+        width, height = self._cell_size(level)
+        last = 2 ** level - 1
+        return (min(last, max(0, int((x - self._bounds[0]) / width))),
+                min(last, max(0, int((y - self._bounds[1]) / height))))
+
+    def _insert(self, item: int, box: Box) -> None:
+        """ Store <item>, whose rectangle is <box>, in its cell.
+        """
+        root_width, root_height = self._cell_size(0)
+        level = QUADTREE_DEPTH
+        for size, root_size in ((box[2] - box[0], root_width),
+                                (box[3] - box[1], root_height)):
+            if size > 0:
+                level = min(level, max(0, int(math.log2(root_size / size))))
+        cell = self._cell_of(level, (box[0] + box[2]) / 2,
+                             (box[1] + box[3]) / 2)
+        self._levels[level].setdefault(cell, []).append(item)
+
+    def query(self, lower_x: float, lower_y: float,
+              upper_x: float, upper_y: float) -> List[int]:
+        """ Return the items whose rectangles intersect the rectangle from
+        (<lower_x>, <lower_y>) to (<upper_x>, <upper_y>), boundary included,
+        in increasing order.
+        """
+        boxes = self.boxes
+        found = []
+        for level, cells in enumerate(self._levels):
+            if not cells:
+                continue
+            width, height = self._cell_size(level)
+            first = self._cell_of(level, lower_x - width / 2,
+                                  lower_y - height / 2)
+            last = self._cell_of(level, upper_x + width / 2,
+                                 upper_y + height / 2)
+            if (last[0] - first[0] + 1) * (last[1] - first[1] + 1) > \
+                    len(cells):
+                # Fewer cells are occupied than covered by the query
+                candidates = [items for (col, row), items in cells.items()
+                              if first[0] <= col <= last[0] and
+                              first[1] <= row <= last[1]]
+            else:
+                candidates = [cells[(col, row)]
+                              for col in range(first[0], last[0] + 1)
+                              for row in range(first[1], last[1] + 1)
+                              if (col, row) in cells]
+            for items in candidates:
+                for item in items:
+                    box = boxes[item]
+                    if box[0] <= upper_x and lower_x <= box[2] and \
+                            box[1] <= upper_y and lower_y <= box[3]:
+                        found.append(item)
+        found.sort()
+        return found
+
+
+def clip_segment(start: Tuple[float, float], end: Tuple[float, float],
+                 box: Box) -> Optional[Tuple[Tuple[float, float],
+                                             Tuple[float, float]]]:
+    """ Return the part of the segment from <start> to <end> inside the
+    rectangle <box>, or None if the segment does not meet <box>.
+
+    A segment lying inside <box> is returned unchanged.
+    """
+    if box[0] <= start[0] <= box[2] and box[1] <= start[1] <= box[3] and \
+            box[0] <= end[0] <= box[2] and box[1] <= end[1] <= box[3]:
+        return start, end
+    # Liang-Barsky: clip the parameter range [t0, t1] of the segment
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, start[0] - box[0]), (dx, box[2] - start[0]),
+                 (-dy, start[1] - box[1]), (dy, box[3] - start[1])):
+        if p == 0:
+            if q < 0:
+                return None
+        elif p < 0:
+            t0 = max(t0, q / p)
+        else:
+            t1 = min(t1, q / p)
+        if t0 > t1:
+            return None
+    return ((start[0] + t0 * dx, start[1] + t0 * dy),
+            (start[0] + t1 * dx, start[1] + t1 * dy))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,100 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import pytest
+from callindex import CallIndex, Selection, get_call_index
+
+"""
+=== Module Description ===
+
+This file contains tests for the search structures of CallIndex.
+"""
+
+
+def test_calls_in_area_outside_grid(dataset) -> None:
+    """ Test rectangles which extend past the calls, or miss them entirely.
+    """
+    _, data = dataset
+    index = CallIndex(data)
+    assert index.calls_in_area(-80.0, 43.0, -79.0, 44.0) == data
+    assert index.calls_in_area(-81.0, 43.0, -80.0, 44.0) == []
+    assert index.calls_in_area(-79.5, 44.0, -79.4, 45.0) == []
+
+
+def test_calls_in_area_empty() -> None:
+    """ Test the queries on an empty list of calls.
+    """
+    assert CallIndex([]).calls_in_area(-80.0, 43.0, -79.0, 44.0) == []
+
+
+def test_get_call_index_reuses_index(dataset) -> None:
+    """ Test that get_call_index returns the same index for the same list,
+    and a new one once calls were removed from it.
+    """
+    _, data = dataset
+    calls = list(data)
+    index = get_call_index(calls)
+    assert get_call_index(calls) is index
+    assert get_call_index(list(data)) is not index
+    calls.pop()
+    index = get_call_index(calls)
+    assert len(index) == len(calls)
+    assert index.calls_in_area(-80.0, 43.0, -79.0, 44.0) == calls
+
+
+def test_calls_with_duration_after_refresh(dataset) -> None:
+    """ Test that the sorted durations take in the calls appended after they
+    were built.
+    """
+    _, data = dataset
+    calls = data[:500]
+    index = get_call_index(calls)
+    assert index.calls_with_duration(100, 200) == \
+        [call for call in calls if 100 <= call.duration <= 200]
+    calls.extend(data[500:])
+    index = get_call_index(calls)
+    assert index.calls_with_duration(100, 200) == \
+        [call for call in data if 100 <= call.duration <= 200]
+    assert index.calls_with_duration(upper=10) == \
+        [call for call in data if call.duration <= 10]
+    assert index.calls_with_duration(lower=590) == \
+        [call for call in data if call.duration >= 590]
+
+
+def test_selection_operators(dataset) -> None:
+    """ Test the set operations of selections over the same index.
+    """
+    _, data = dataset
+    index = CallIndex(data)
+    odd = Selection.from_positions(index, range(1, len(data), 2))
+    low = Selection.from_positions(index, range(100))
+    assert len(odd) == len(data) // 2
+    assert (odd & low).positions() == list(range(1, 100, 2))
+    assert (odd | low).positions() == \
+        sorted(set(range(1, len(data), 2)) | set(range(100)))
+    assert (~odd).positions() == list(range(0, len(data), 2))
+    assert (~odd).calls() == data[::2]
+    assert Selection.everything(index).calls() == data
+    assert len(~Selection.everything(index)) == 0
+
+
+def test_selection_over_other_calls(dataset) -> None:
+    """ Test that selections over different indexes cannot be combined.
+    """
+    _, data = dataset
+    first = Selection.everything(CallIndex(data))
+    second = Selection.everything(CallIndex(data))
+    with pytest.raises(ValueError):
+        first & second
+    with pytest.raises(ValueError):
+        first | second
@@ -0,0 +1,296 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import datetime
+from typing import List
+from call import Call
+from contract import MTMContract
+from phoneline import PhoneLine
+from filter import CustomerFilter, DurationFilter, LocationFilter, \
+    DateRangeFilter, ExpressionFilter
+
+"""
+=== Module Description ===
+
+This file contains tests checking the indexed filters against a scan of every
+call, and their handling of invalid filter strings.
+"""
+
+
+def _durations(data: List[Call], lower: int, upper: int) -> List[Call]:
+    """ Return the calls from <data> lasting between <lower> and <upper>
+    seconds, inclusive, in order.
+    """
+    return [call for call in data if lower <= call.duration <= upper]
+
+
+def _in_period(data: List[Call], start: datetime.datetime,
+               end: datetime.datetime) -> List[Call]:
+    """ Return the calls from <data> made from <start> to <end>, inclusive,
+    in order.
+    """
+    return [call for call in data if start <= call.time <= end]
+
+
+def _in_area(call: Call, lower_long: float, lower_lat: float,
+             upper_long: float, upper_lat: float) -> bool:
+    """ Return True iff the source or the destination of <call> lies inside
+    the given rectangle, boundary included.
+    """
+    return any(lower_long <= loc[0] <= upper_long
+               and lower_lat <= loc[1] <= upper_lat
+               for loc in (call.src_loc, call.dst_loc))
+
+
+def _calls_in_area(data: List[Call], lower_long: float, lower_lat: float,
+                   upper_long: float, upper_lat: float) -> List[Call]:
+    """ Return the calls from <data> in the given rectangle, in order.
+    """
+    return [call for call in data
+            if _in_area(call, lower_long, lower_lat, upper_long, upper_lat)]
+
+
+def test_location_filter_matches_scan(dataset) -> None:
+    """ Test that LocationFilter returns the calls with an endpoint in the
+    rectangle, including the calls on its boundary, in their original order.
+    """
+    customers, data = dataset
+    f = LocationFilter()
+    for bounds in [(-79.6, 43.6, -79.3, 43.7),
+                   (-79.5, 43.65, -79.5, 43.65),
+                   (-79.45, 43.7, -79.449, 43.702),
+                   (-79.697878, 43.576959, -79.196382, 43.799568),
+                   (-79.3, 43.7, -79.4, 43.6)]:
+        filter_string = '{}, {}, {}, {}'.format(*bounds)
+        assert f.apply(customers, data, filter_string) == \
+            _calls_in_area(data, *bounds)
+
+
+def test_location_filter_invalid_strings(dataset) -> None:
+    """ Test that LocationFilter returns <data> unchanged for invalid filter
+    strings and rectangles leaving the map.
+    """
+    customers, data = dataset
+    f = LocationFilter()
+    for filter_string in ['', '-79.6, 43.6, -79.3', '-79.6,43.6,-79.3,43.7',
+                          '-79.6, 43.6, -79.3, abc', '-79.6, , -79.3, 43.7',
+                          '-80.0, 43.6, -79.3, 43.7',
+                          '-79.6, 43.6, -79.3, 44.0']:
+        assert f.apply(customers, data, filter_string) is data
+
+
+def test_location_filter_sees_appended_calls(dataset) -> None:
+    """ Test that the calls appended to a list after it was filtered are
+    found by the next filter on that list.
+    """
+    customers, data = dataset
+    f = LocationFilter()
+    calls = data[:1000]
+    filter_string = '-79.6, 43.6, -79.3, 43.7'
+    f.apply(customers, calls, filter_string)
+    calls.extend(data[1000:])
+    assert f.apply(customers, calls, filter_string) == \
+        _calls_in_area(data, -79.6, 43.6, -79.3, 43.7)
+
+
+def test_duration_filter_less_and_greater(dataset) -> None:
+    """ Test that "Lxxx" and "Gxxx" select the calls strictly shorter and
+    strictly longer than xxx seconds.
+    """
+    customers, data = dataset
+    f = DurationFilter()
+    for limit in [0, 1, 100, 300, 600, 1000]:
+        assert f.apply(customers, data, 'L{}'.format(limit)) == \
+            _durations(data, 0, limit - 1)
+        assert f.apply(customers, data, 'G{}'.format(limit)) == \
+            _durations(data, limit + 1, 10 ** 6)
+
+
+def test_duration_filter_range(dataset) -> None:
+    """ Test that "xxx-yyy" selects the calls lasting between xxx and yyy
+    seconds, both included.
+    """
+    customers, data = dataset
+    f = DurationFilter()
+    for lower, upper in [(0, 0), (1, 1), (100, 200), (250, 250), (0, 1000),
+                         (599, 600)]:
+        assert f.apply(customers, data, '{}-{}'.format(lower, upper)) == \
+            _durations(data, lower, upper)
+
+
+def test_duration_filter_invalid_strings(dataset) -> None:
+    """ Test that DurationFilter returns <data> unchanged for invalid filter
+    strings, including reversed ranges.
+    """
+    customers, data = dataset
+    f = DurationFilter()
+    for filter_string in ['', 'L', 'G', 'X100', 'L-5', 'L1.5', '100',
+                          '100-', '-100', '1-2-3', 'a-b', '200-100']:
+        assert f.apply(customers, data, filter_string) is data
+
+
+def test_customer_filter_matches_scan(dataset) -> None:
+    """ Test that CustomerFilter returns the calls made or received by any
+    line of the customer, in their original order.
+    """
+    customers, data = dataset
+    f = CustomerFilter()
+    for customer in customers:
+        numbers = customer.get_phone_numbers()
+        assert f.apply(customers, data, str(customer.get_id())) == \
+            [call for call in data
+             if call.src_number in numbers or call.dst_number in numbers]
+
+
+def test_customer_filter_sees_new_lines(dataset) -> None:
+    """ Test that CustomerFilter uses the current phone lines of a customer,
+    after a line was added to it since it was last filtered on.
+    """
+    customers, data = dataset
+    f = CustomerFilter()
+    customer = customers[1]
+    f.apply(customers, data, str(customer.get_id()))
+    customer.add_phone_line(
+        PhoneLine(customers[0].get_phone_numbers()[0],
+                  MTMContract(datetime.date(2017, 12, 25))))
+    numbers = customer.get_phone_numbers()
+    assert f.apply(customers, data, str(customer.get_id())) == \
+        [call for call in data
+         if call.src_number in numbers or call.dst_number in numbers]
+
+
+def test_customer_filter_invalid_strings(dataset) -> None:
+    """ Test that CustomerFilter returns <data> unchanged for invalid filter
+    strings and unknown customers.
+    """
+    customers, data = dataset
+    f = CustomerFilter()
+    for filter_string in ['', 'abc', '-1000', '1000.0', '999', '99999']:
+        assert f.apply(customers, data, filter_string) is data
+
+
+def test_expression_filter_matches_scan(dataset) -> None:
+    """ Test that ExpressionFilter combines its terms with AND, OR and NOT,
+    AND binding tighter than OR, and keeps the calls in their original order.
+    """
+    customers, data = dataset
+    numbers = customers[3].get_phone_numbers()
+
+    def of_customer(call: Call) -> bool:
+        """ Return True iff <call> was made or received by customer 1003.
+        """
+        return call.src_number in numbers or call.dst_number in numbers
+
+    def short(call: Call) -> bool:
+        """ Return True iff <call> lasted less than a minute.
+        """
+        return call.duration < 60
+
+    def in_area(call: Call) -> bool:
+        """ Return True iff <call> has an endpoint in the tested area.
+        """
+        return _in_area(call, -79.6, 43.6, -79.3, 43.7)
+
+    f = ExpressionFilter()
+    area = 'l -79.6, 43.6, -79.3, 43.7'
+    for filter_string, matches in [
+            ('c 1003', of_customer),
+            ('!d L60', lambda call: not short(call)),
+            ('c 1003 | d L60', lambda call: of_customer(call) or short(call)),
+            ('c 1003 & ' + area,
+             lambda call: of_customer(call) and in_area(call)),
+            ('c 1003 | !d L60 & ' + area,
+             lambda call: of_customer(call) or
+             (not short(call) and in_area(call))),
+            ('! c 1003 & !c 1003', lambda call: not of_customer(call))]:
+        assert f.apply(customers, data, filter_string) == \
+            [call for call in data if matches(call)]
+
+
+def test_expression_filter_invalid_strings(dataset) -> None:
+    """ Test that ExpressionFilter returns <data> unchanged for invalid
+    expressions, including expressions with an invalid term.
+    """
+    customers, data = dataset
+    f = ExpressionFilter()
+    for filter_string in ['', 'c', 'c1003', 'x 1003', 'c 1003 &',
+                          '| d L60', 'c 1003 && d L60', '!!c 1003',
+                          'c abc', 'd X60', 'c 1003 | l -79.6, 43.6']:
+        assert f.apply(customers, data, filter_string) is data
+
+
+def test_expression_filter_normalize() -> None:
+    """ Test that equivalent expressions have the same canonical form, and
+    that invalid expressions have the empty one.
+    """
+    f = ExpressionFilter()
+    assert f.normalize('c 1003|!d L060') == f.normalize(' c  1003 | ! d L60')
+    assert f.normalize('c 1003 | d L60') != f.normalize('c 1003 & d L60')
+    assert f.normalize('c 1003 &') == ''
+
+
+def test_date_range_filter_matches_scan(dataset) -> None:
+    """ Test that DateRangeFilter returns the calls made within the period,
+    both ends included, an end given as a date including the whole day.
+    """
+    customers, data = dataset
+    f = DateRangeFilter()
+    moment = data[100].time
+    day = datetime.datetime(2018, 1, 20)
+    for filter_string, start, end in [
+            ('2018-01-20, 2018-01-20', day,
+             day + datetime.timedelta(days=1, microseconds=-1)),
+            ('2018-01-20 08:00, 2018-01-20 18:00',
+             day.replace(hour=8), day.replace(hour=18)),
+            ('2018-01-20 08:00:30, 2018-02-01',
+             day.replace(hour=8, second=30), datetime.datetime(2018, 2, 2)
+             - datetime.timedelta(microseconds=1)),
+            ('{0}, {0}'.format(moment.strftime('%Y-%m-%d %H:%M:%S')),
+             moment, moment),
+            ('2017-01-01, 2017-12-31', day, day - datetime.timedelta(1))]:
+        result = f.apply(customers, data, filter_string)
+        assert result == _in_period(data, start, end)
+    assert data[100] in f.apply(
+        customers, data,
+        '{0}, {0}'.format(moment.strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def test_date_range_filter_invalid_strings(dataset) -> None:
+    """ Test that DateRangeFilter returns <data> unchanged for invalid filter
+    strings and periods ending before they start.
+    """
+    customers, data = dataset
+    f = DateRangeFilter()
+    for filter_string in ['', '2018-01-20', '2018-01-20,2018-01-21',
+                          '2018-01-20, 2018-01-21, 2018-01-22',
+                          '2018-13-01, 2018-12-01', '2018-01-20, tomorrow',
+                          '2018-01-20 25:00, 2018-01-21',
+                          '2018-01-21, 2018-01-20',
+                          '2018-01-20 18:00, 2018-01-20 08:00']:
+        assert f.apply(customers, data, filter_string) is data
+
+
+def test_expression_filter_period_terms(dataset) -> None:
+    """ Test the "t" terms of a filter expression.
+    """
+    customers, data = dataset
+    f = ExpressionFilter()
+    start = datetime.datetime(2018, 1, 20, 8)
+    end = datetime.datetime(2018, 1, 25, 18)
+    period = _in_period(data, start, end)
+    assert f.apply(customers, data,
+                   't 2018-01-20 08:00, 2018-01-25 18:00 & d G300') == \
+        [call for call in period if call.duration > 300]
+    assert f.apply(customers, data,
+                   '!t 2018-01-20 08:00, 2018-01-25 18:00') == \
+        [call for call in data if call not in period]
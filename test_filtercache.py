@@ -0,0 +1,140 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import sys
+from typing import List
+from call import Call
+from customer import Customer
+from filter import Filter, DurationFilter, ResetFilter
+from filtercache import FilterCache
+
+"""
+=== Module Description ===
+
+This file contains tests for the keys and the eviction of FilterCache.
+"""
+
+
+class _CountingApply:
+    """ A filter application function counting how often it is called.
+
+    === Public Attributes ===
+    count:
+         the number of filters applied so far
+    """
+    count: int
+
+    def __init__(self) -> None:
+        """ Create a function which has not applied any filter yet.
+        """
+        self.count = 0
+
+    def __call__(self, f: Filter, customers: List[Customer],
+                 data: List[Call], filter_string: str) -> List[Call]:
+        """ Return f.apply(customers, data, filter_string).
+        """
+        self.count += 1
+        return f.apply(customers, data, filter_string)
+
+
+def test_equivalent_filter_strings_hit(dataset) -> None:
+    """ Test that filter strings with the same canonical form share their
+    cached result, and that other filter strings do not.
+    """
+    customers, data = dataset
+    cache = FilterCache()
+    apply_filter = _CountingApply()
+    f = DurationFilter()
+    result = cache.apply(f, customers, data, 'L100', apply_filter)
+    assert result == f.apply(customers, data, 'L100')
+    assert cache.apply(f, customers, data, 'L0100', apply_filter) is result
+    assert cache.apply(f, customers, data, 'G100', apply_filter) \
+        is not result
+    assert apply_filter.count == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert len(cache) == 2
+
+
+def test_new_or_grown_call_set_misses(dataset) -> None:
+    """ Test that a result is not reused for another list of calls, even an
+    equal one, or for the same list once calls were appended to it.
+    """
+    customers, data = dataset
+    cache = FilterCache()
+    apply_filter = _CountingApply()
+    f = DurationFilter()
+    calls = data[:1000]
+    cache.apply(f, customers, calls, 'L100', apply_filter)
+    cache.apply(f, customers, list(calls), 'L100', apply_filter)
+    calls.append(data[1000])
+    result = cache.apply(f, customers, calls, 'L100', apply_filter)
+    assert result == f.apply(customers, calls, 'L100')
+    assert apply_filter.count == 3
+    assert cache.hits == 0
+
+
+def test_reset_is_keyed_on_customers(dataset) -> None:
+    """ Test that the result of a reset is reused whatever the call set it is
+    applied to.
+    """
+    customers, data = dataset
+    cache = FilterCache()
+    apply_filter = _CountingApply()
+    result = cache.apply(ResetFilter(), customers, data, '', apply_filter)
+    assert cache.apply(ResetFilter(), customers, data[:10], 'x',
+                       apply_filter) is result
+    assert apply_filter.count == 1
+
+
+def test_eviction(dataset) -> None:
+    """ Test that the least recently used results are evicted once the memory
+    budget is exceeded, and that results larger than the budget are not
+    cached at all.
+    """
+    customers, data = dataset
+    f = DurationFilter()
+    size = sys.getsizeof(f.apply(customers, data, 'L300'))
+    cache = FilterCache(size + sys.getsizeof(f.apply(customers, data,
+                                                     'G300')))
+    apply_filter = _CountingApply()
+    cache.apply(f, customers, data, 'L300', apply_filter)
+    cache.apply(f, customers, data, 'G300', apply_filter)
+    cache.apply(f, customers, data, 'L300', apply_filter)
+    assert len(cache) == 2
+    # 'G300' is now the least recently used result
+    cache.apply(f, customers, data, 'L200', apply_filter)
+    cache.apply(f, customers, data, 'L300', apply_filter)
+    assert apply_filter.count == 3
+    cache.apply(f, customers, data, 'G300', apply_filter)
+    assert apply_filter.count == 4
+
+    cache = FilterCache(size // 2)
+    cache.apply(f, customers, data, 'L300', apply_filter)
+    assert len(cache) == 0
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lookup_and_store(dataset) -> None:
+    """ Test that a stored result is found by lookup, under the canonical
+    form of its filter string, and only for the call set it was stored for.
+    """
+    customers, data = dataset
+    cache = FilterCache()
+    f = DurationFilter()
+    assert cache.lookup(f, customers, data, 'L100') is None
+    result = f.apply(customers, data, 'L100')
+    cache.store(f, customers, data, 'L100', result)
+    assert cache.lookup(f, customers, data, 'L0100') is result
+    assert cache.lookup(f, customers, data[:10], 'L100') is None
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,84 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+from typing import List
+import pytest
+import filterpool
+from call import Call
+from customer import Customer
+from filter import Filter, DurationFilter, ExpressionFilter, ResetFilter
+from filterjob import FilterJob
+from filterpool import FilterPool
+
+"""
+=== Module Description ===
+
+This file contains tests for the filters applied in the background by
+FilterJob.
+"""
+
+
+class _FailingFilter(Filter):
+    """ A filter which always fails.
+    """
+    def apply(self, customers: List[Customer],
+              data: List[Call],
+              filter_string: str) \
+            -> List[Call]:
+        """ Raise a ValueError.
+        """
+        raise ValueError(filter_string)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_job_matches_filter(dataset, monkeypatch, workers: int) -> None:
+    """ Test that a finished job returns the calls the filter returns, and
+    reports that all calls were scanned.
+    """
+    monkeypatch.setattr(filterpool, 'PARALLEL_MIN_CALLS', 1)
+    monkeypatch.setattr(filterpool, 'LOCAL_CHUNK_SIZE', 300)
+    customers, data = dataset
+    pool = FilterPool(workers)
+    try:
+        for f, filter_string in [(DurationFilter(), '100-200'),
+                                 (ExpressionFilter(), 'c 1003 | d L60'),
+                                 (DurationFilter(), 'X'),
+                                 (ResetFilter(), '')]:
+            job = FilterJob(f, customers, data, filter_string, pool)
+            job.wait()
+            assert job.done() and not job.cancelled()
+            assert job.progress() == 1.0
+            assert job.result() == f.apply(customers, data, filter_string)
+    finally:
+        pool.close()
+
+
+def test_cancelled_job_stops(dataset) -> None:
+    """ Test that a cancelled job stops and reports its cancellation.
+    """
+    customers, data = dataset
+    job = FilterJob(DurationFilter(), customers, data, 'L100', FilterPool(1))
+    job.cancel()
+    job.wait()
+    assert job.done() and job.cancelled()
+
+
+def test_failed_job_raises(dataset) -> None:
+    """ Test that the exception raised by a failing filter is raised again by
+    result().
+    """
+    customers, data = dataset
+    job = FilterJob(_FailingFilter(), customers, data, 'oops', FilterPool(1))
+    job.wait()
+    with pytest.raises(ValueError):
+        job.result()
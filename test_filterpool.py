@@ -0,0 +1,61 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import filterpool
+from callindex import get_call_index
+from filter import CustomerFilter, DurationFilter, LocationFilter, \
+    DateRangeFilter, ResetFilter
+from filterpool import FilterPool
+
+"""
+=== Module Description ===
+
+This file contains tests checking that the filters applied by the worker
+processes of a FilterPool return the same calls as the filters themselves.
+"""
+
+# Filters and filter strings checked against the filters themselves
+FILTERS = [(DurationFilter(), 'L100'), (DurationFilter(), 'G500'),
+           (DurationFilter(), '100-200'), (DurationFilter(), 'X'),
+           (LocationFilter(), '-79.6, 43.6, -79.3, 43.7'),
+           (LocationFilter(), '-79.6, 43.6'),
+           (CustomerFilter(), '1003'), (CustomerFilter(), '999'),
+           (DateRangeFilter(), '2018-01-20 08:00, 2018-01-25'),
+           (ResetFilter(), '')]
+
+
+def test_pool_matches_filters(dataset, monkeypatch) -> None:
+    """ Test that a pool of two workers filtering every call set in parallel
+    returns the calls the filters return, in the same order.
+
+    The NumPy columns of the call sets are built first, so that the broad
+    filters are scanned by the workers.
+    """
+    monkeypatch.setattr(filterpool, 'PARALLEL_MIN_CALLS', 1)
+    customers, data = dataset
+    pool = FilterPool(2)
+    try:
+        calls = data[:1000]
+        get_call_index(calls).columns()
+        for f, filter_string in FILTERS:
+            assert pool.apply(f, customers, calls, filter_string) == \
+                f.apply(customers, calls, filter_string)
+        # The columns of a call set are rebuilt once calls are appended to it
+        calls.extend(data[1000:])
+        get_call_index(calls).columns()
+        for f, filter_string in FILTERS:
+            assert pool.apply(f, customers, calls, filter_string) == \
+                f.apply(customers, calls, filter_string)
+        assert pool._columns is not None and pool._columns.size == len(calls)
+    finally:
+        pool.close()
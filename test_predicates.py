@@ -0,0 +1,105 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import pytest
+from callindex import get_call_index, numpy
+from filter import CustomerFilter, DurationFilter, LocationFilter, \
+    DateRangeFilter, ExpressionFilter, ResetFilter
+from predicates import DEFAULT_BACKEND
+
+"""
+=== Module Description ===
+
+This file contains tests checking that the backends of the compiled filters
+select the same calls.
+"""
+
+# Filters and valid filter strings compiled by the tests
+FILTERS = [(CustomerFilter(), '1003'), (CustomerFilter(), '1029'),
+           (DurationFilter(), 'L100'), (DurationFilter(), 'G599'),
+           (DurationFilter(), '250-260'),
+           (LocationFilter(), '-79.6, 43.6, -79.3, 43.7'),
+           (LocationFilter(), '-79.5, 43.65, -79.5, 43.65'),
+           (DateRangeFilter(), '2018-01-20 08:00, 2018-01-25'),
+           (ExpressionFilter(), 'c 1003 | !d L60 & l -79.6, 43.6, -79.3, '
+                                '43.7'),
+           (ExpressionFilter(), '!t 2018-01-20, 2018-01-25 & !c 1003')]
+
+# The backends checked, skipping NumPy when it is not installed
+BACKENDS = ['python', 'index'] + (['numpy'] if numpy is not None else [])
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backends_match_filters(dataset, backend: str) -> None:
+    """ Test that every backend of a compiled filter returns the calls the
+    filter returns, in their original order.
+    """
+    customers, data = dataset
+    for f, filter_string in FILTERS:
+        predicate = f.compile(customers, filter_string)
+        assert predicate is not None
+        expected = [call for call in data if predicate.matches(call)]
+        assert predicate.apply(data, backend) == expected
+        assert f.apply(customers, data, filter_string) == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backends_after_append(dataset, backend: str) -> None:
+    """ Test that every backend takes in the calls appended to a list after
+    it was filtered.
+    """
+    customers, data = dataset
+    calls = data[:1000]
+    for f, filter_string in FILTERS:
+        f.compile(customers, filter_string).apply(calls, backend)
+    calls.extend(data[1000:])
+    for f, filter_string in FILTERS:
+        predicate = f.compile(customers, filter_string)
+        assert predicate.apply(calls, backend) == \
+            predicate.apply(data, 'python')
+
+
+def test_invalid_strings_do_not_compile(dataset) -> None:
+    """ Test that invalid filter strings, and filters which are not column
+    queries, are not compiled.
+    """
+    customers, _ = dataset
+    for f, filter_string in [(CustomerFilter(), 'abc'),
+                             (CustomerFilter(), '999'),
+                             (DurationFilter(), '200-100'),
+                             (LocationFilter(), '-79.6, 43.6'),
+                             (DateRangeFilter(), '2018-01-21, 2018-01-20'),
+                             (ExpressionFilter(), 'c 1003 &'),
+                             (ResetFilter(), '')]:
+        assert f.compile(customers, filter_string) is None
+
+
+def test_backend_choice(dataset) -> None:
+    """ Test that a plain loop is chosen for the first predicate checked
+    against a list, then the search structures for the selective predicates
+    and DEFAULT_BACKEND for the others.
+    """
+    customers, data = dataset
+    calls = list(data)
+    narrow = DurationFilter().compile(customers, '100-105')
+    broad = DurationFilter().compile(customers, 'G60')
+    assert narrow.selective(calls) and not broad.selective(calls)
+    assert narrow.backend_for(calls) == 'python'
+    assert narrow.backend_for(calls) == 'index'
+    assert broad.backend_for(calls) == DEFAULT_BACKEND
+
+    if numpy is not None:
+        # The columns of a list are used as soon as they are built
+        calls = list(data)
+        get_call_index(calls).columns()
+        assert broad.backend_for(calls) == 'numpy'
@@ -0,0 +1,126 @@
+"""Assignment 2: Tests for the incremental treemap layout
+
+=== CSC148 Winter 2019 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, David Liu, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+This module checks that the treemap laid out incrementally by
+update_rectangles, after any sequence of edits, expansions and collapses,
+is the same as the treemap laid out from scratch.
+"""
+from __future__ import annotations
+import copy
+import random
+from typing import List, Optional, Tuple
+from tm_trees import TMTree
+
+# The rectangle the test trees are laid out in
+RECT = (0, 0, 800, 570)
+
+
+def _make_tree(rng: random.Random, depth: int) -> TMTree:
+    """Return a random tree of at most <depth> levels below its root.
+    """
+    if depth == 0 or (depth < 3 and rng.random() < 0.3):
+        return TMTree('leaf', [], rng.randint(1, 100))
+    return TMTree('folder', [_make_tree(rng, depth - 1)
+                             for _ in range(rng.randint(1, 5))])
+
+
+def _all_trees(tree: TMTree) -> List[TMTree]:
+    """Return <tree> and all of its descendants.
+    """
+    result = [tree]
+    for sub in tree._subtrees:
+        result.extend(_all_trees(sub))
+    return result
+
+
+def _linear_tree_at_position(tree: TMTree, pos: Tuple[int, int]) \
+        -> Optional[TMTree]:
+    """Return the tree TMTree.get_tree_at_position returns, found by checking
+    every displayed tree in order.
+    """
+    x, y, width, height = tree.rect
+    if not tree._expanded or len(tree._subtrees) == 0:
+        if x <= pos[0] <= x + width and y <= pos[1] <= y + height:
+            return tree
+        return None
+    for sub in tree._subtrees:
+        result = _linear_tree_at_position(sub, pos)
+        if result is not None:
+            return result
+    return None
+
+
+def _full_layout(tree: TMTree) -> list:
+    """Return the rectangles of a copy of <tree> laid out from scratch in
+    RECT, leaving <tree> as it is.
+    """
+    tree = copy.deepcopy(tree)
+    for sub in _all_trees(tree):
+        sub.rect = (0, 0, 0, 0)
+        sub._layout_stale = True
+        sub._hit_index = None
+        sub._rectangles = None
+    tree.update_rectangles(RECT)
+    return tree.get_rectangles()
+
+
+def test_expand_all_after_collapse() -> None:
+    """Test that expand_all lays out the subtrees which were collapsed when
+    the tree was last laid out.
+    """
+    tree = _make_tree(random.Random(0), 4)
+    tree.update_rectangles(RECT)
+    tree.expand()
+    tree._subtrees[0].collapse()
+    tree.expand_all()
+    assert tree.get_rectangles() == _full_layout(tree)
+    for rect, _ in tree.get_rectangles():
+        assert rect[2] > 0 or rect[3] > 0
+
+
+def test_incremental_layout_matches_full_layout() -> None:
+    """Test that the incremental layout and the hit-testing match a layout
+    from scratch after random sequences of changes.
+    """
+    for seed in range(100):
+        rng = random.Random(seed)
+        tree = _make_tree(rng, 4)
+        tree.update_rectangles(RECT)
+        for _ in range(15):
+            node = rng.choice(_all_trees(tree))
+            action = rng.randrange(6)
+            if action == 0:
+                node.expand()
+            elif action == 1:
+                node.expand_all()
+            elif action == 2:
+                node.collapse()
+            elif action == 3:
+                node.collapse_all()
+            elif action == 4:
+                node.change_size(rng.choice([-0.5, 0.01, 0.5, 2]))
+            else:
+                node.move(rng.choice(_all_trees(tree)))
+            tree.update_rectangles(RECT)
+            rectangles = list(tree.get_rectangles())
+            points = [(rng.randrange(RECT[2]), rng.randrange(RECT[3]))
+                      for _ in range(10)]
+            hits = [tree.get_tree_at_position(pos) for pos in points]
+            assert rectangles == _full_layout(tree)
+            assert hits == [_linear_tree_at_position(tree, pos)
+                            for pos in points]
+
+
+if __name__ == '__main__':
+    import pytest
+    pytest.main(['test_tm_trees.py'])
@@ -19,6 +19,7 @@ computer's file system.
 from __future__ import annotations
 import os
 import math
+from bisect import bisect_left
 from random import randint
 from typing import List, Tuple, Optional
 
@@ -29,7 +30,8 @@ class TMTree:
 
     This is an abstract class that should not be instantiated directly.
 
-    You may NOT add any attributes, public or private, to this class.
+    You may NOT add any public attributes to this class, and the only
+    private attributes besides those below are caches of the treemap layout.
     However, part of this assignment will involve you implementing new public
     *methods* for this interface.
     You should not add any new public methods other than those required by
@@ -55,6 +57,20 @@ class TMTree:
         as a subtree, or None if this tree is not part of a larger tree.
     _expanded:
         Whether or not this tree is considered expanded for visualization.
+    _layout_stale:
+        Whether the rectangles of the subtrees of this tree may not match
+        its current rect and the sizes of its subtrees: they were never laid
+        out, or the size of a descendant changed, or this tree was collapsed
+        when its rect last changed, or it was just expanded.
+    _hit_index:
+        The axis along which the subtrees of this tree are laid out, True
+        for vertically, and the end coordinate of each subtree's rectangle
+        along that axis, used to find the subtree at a position with a
+        binary search. None if it is not built yet, or if the subtrees are
+        not laid out one after the other.
+    _rectangles:
+        The list returned by get_rectangles, or None if it is not built yet
+        or the displayed-tree changed since.
 
     === Representation Invariants ===
     - data_size >= 0
@@ -82,6 +98,10 @@ class TMTree:
     _subtrees: List[TMTree]
     _parent_tree: Optional[TMTree]
     _expanded: bool
+    _layout_stale: bool
+    _hit_index: Optional[Tuple[bool, List[int]]]
+    _rectangles: Optional[List[Tuple[Tuple[int, int, int, int],
+                                     Tuple[int, int, int]]]]
 
     def __init__(self, name: str, subtrees: List[TMTree],
                  data_size: int = 0) -> None:
@@ -104,6 +124,9 @@ class TMTree:
 
         # You will change this in Task 5
         self._expanded = False
+        self._layout_stale = True
+        self._hit_index = None
+        self._rectangles = None
 
         # TODO: (Task 1) Complete this initializer by doing two things:
         # 1. Initialize self._colour and self.data_size, according to the
@@ -130,6 +153,11 @@ class TMTree:
     def update_rectangles(self, rect: Tuple[int, int, int, int]) -> None:
         """Update the rectangles in this tree and its descendents using the
         treemap algorithm to fill the area defined by pygame rectangle <rect>.
+
+        Only the displayed-tree is laid out: the subtrees of a collapsed tree
+        are laid out once it is expanded. A tree whose rectangle is already
+        <rect>, and whose subtrees are not stale, is left as it is, so after
+        an edit only the trees whose rectangle changed are laid out again.
         """
         # TODO: (Task 2) Complete the body of this method.
         # Read the handout carefully to help get started identifying base cases,
@@ -138,39 +166,61 @@ class TMTree:
         # Programming tip: use "tuple unpacking assignment" to easily extract
         # elements of a rectangle, as follows.
         # x, y, width, height = rect
+        if rect != self.rect or self._layout_stale:
+            self._clear_rectangles()
+        self._layout(rect)
+
+    def _layout(self, rect: Tuple[int, int, int, int]) -> None:
+        """Lay out this tree and its descendants as update_rectangles does,
+        dropping the cached rectangles of the trees laid out again, but not
+        those of the ancestors of this tree.
+        """
         x, y, width, height = rect
         if self.is_empty():
             pass
+        elif rect == self.rect and not self._layout_stale:
+            pass
         elif len(self._subtrees) == 0:
             self.rect = rect
+            self._rectangles = None
+        elif not self._expanded:
+            self.rect = rect
+            self._layout_stale = True
+            self._rectangles = None
         elif height >= width:
             self.rect = rect
+            self._layout_stale = False
+            self._hit_index = None
+            self._rectangles = None
             final_height = y + height
             for sub in self._subtrees[:-1]:
                 if sub.data_size == 0:
                     new_height = 0
-                    sub.update_rectangles((x, y, 0, 0))
+                    sub._layout((x, y, 0, 0))
                 else:
                     prop = float(sub.data_size / self.data_size)
                     new_height = int(math.floor(prop * height))
-                    sub.update_rectangles((x, y, width, new_height))
+                    sub._layout((x, y, width, new_height))
                 y = y + new_height
             last_sub = self._subtrees[-1]
-            last_sub.update_rectangles((x, y, width, final_height - y))
+            last_sub._layout((x, y, width, final_height - y))
         else:
             self.rect = rect
+            self._layout_stale = False
+            self._hit_index = None
+            self._rectangles = None
             final_width = x + width
             for sub in self._subtrees[:-1]:
                 if self.data_size == 0:
                     new_width = 0
-                    sub.update_rectangles((x, y, 0, 0))
+                    sub._layout((x, y, 0, 0))
                 else:
                     prop = float(sub.data_size / self.data_size)
                     new_width = int(math.floor(prop * width))
-                    sub.update_rectangles((x, y, new_width, height))
+                    sub._layout((x, y, new_width, height))
                 x = x + new_width
             last_sub = self._subtrees[-1]
-            last_sub.update_rectangles((x, y, final_width - x, height))
+            last_sub._layout((x, y, final_width - x, height))
 
     def get_rectangles(self) -> List[Tuple[Tuple[int, int, int, int],
                                            Tuple[int, int, int]]]:
@@ -178,20 +228,37 @@ class TMTree:
         rooted at this tree. Each tuple consists of a tuple that defines the
         appropriate pygame rectangle to display for a leaf, and the colour
         to fill it with.
+
+        The list is kept by this tree, and returned again until the displayed
+        leaves or their rectangles change, so it must not be modified.
         """
         # TODO: (Task 2) Complete the body of this method.
+        if self._rectangles is None:
+            self._rectangles = []
+            self._collect_rectangles(self._rectangles)
+        return self._rectangles
+
+    def _collect_rectangles(self, result: List[Tuple[Tuple[int, int, int, int],
+                                                     Tuple[int, int, int]]]) \
+            -> None:
+        """Append the tuples returned by get_rectangles for this tree to
+        <result>.
+        """
         if self.data_size == 0:
-            return []
+            pass
+        elif not self._expanded or len(self._subtrees) == 0:
+            result.append((self.rect, self._colour))
         else:
-            if not self._expanded:
-                return [(self.rect, self._colour)]
-            elif len(self._subtrees) == 0:
-                return [(self.rect, self._colour)]
-            else:
-                result = []
-                for sub in self._subtrees:
-                    result.extend(sub.get_rectangles())
-                return result
+            for sub in self._subtrees:
+                sub._collect_rectangles(result)
+
+    def _clear_rectangles(self) -> None:
+        """Drop the cached rectangles of this tree and of its ancestors.
+        """
+        tree = self
+        while tree is not None:
+            tree._rectangles = None
+            tree = tree._parent_tree
 
     def get_tree_at_position(self, pos: Tuple[int, int]) -> Optional[TMTree]:
         """Return the leaf in the displayed-tree rooted at this tree whose
@@ -200,6 +267,10 @@ class TMTree:
 
         If <pos> is on the shared edge between two rectangles, return the
         tree represented by the rectangle that is closer to the origin.
+
+        At each level, the subtrees which may contain <pos> are found with a
+        binary search on the ends of their rectangles, so the time taken
+        does not grow with the number of subtrees.
         """
         # TODO: (Task 3) Complete the body of this method
         result = None
@@ -211,12 +282,45 @@ class TMTree:
             if (x <= pos_x <= (x + width)) and (y <= pos_y <= (y + height)):
                 return self
         else:
-            for sub in self._subtrees:
+            first, coord = 0, None
+            hit_index = self._get_hit_index()
+            if hit_index is not None:
+                vertical, ends = hit_index
+                coord = pos_y if vertical else pos_x
+                # The subtrees before <first> end before <coord>
+                first = bisect_left(ends, coord)
+            for sub in self._subtrees[first:]:
+                if coord is not None and \
+                        (sub.rect[1] if vertical else sub.rect[0]) > coord:
+                    # This subtree and the following ones start after <coord>
+                    break
                 result = sub.get_tree_at_position(pos)
                 if result is not None:
                     return result
         return result
 
+    def _get_hit_index(self) -> Optional[Tuple[bool, List[int]]]:
+        """Return the hit index of this tree (see _hit_index), building it if
+        needed, or None if the subtrees are not laid out one after the other.
+
+        Precondition: this tree has subtrees.
+        """
+        if self._hit_index is not None:
+            return self._hit_index
+        vertical = self.rect[3] >= self.rect[2]
+        axis = 1 if vertical else 0
+        ends = []
+        position = self._subtrees[0].rect[axis]
+        for sub in self._subtrees:
+            start = sub.rect[axis]
+            end = start + sub.rect[axis + 2]
+            if start < position or end < start:
+                return None
+            ends.append(end)
+            position = end
+        self._hit_index = (vertical, ends)
+        return self._hit_index
+
     def update_data_sizes(self) -> int:
         """Update the data_size for this tree and its subtrees, based on the
         size of their leaves, and return the new size.
@@ -227,6 +331,8 @@ class TMTree:
         if len(self._subtrees) == 0:
             return self.data_size
         else:
+            self._layout_stale = True
+            self._rectangles = None
             self.data_size = 0
             for sub in self._subtrees:
                 self.data_size += sub.update_data_sizes()
@@ -244,23 +350,10 @@ class TMTree:
         else:
             destination._subtrees.append(self)
             if self._parent_tree is not None:
+                self._update_ancestor_sizes(-self.data_size)
                 self._parent_tree._subtrees.remove(self)
-                if len(self._parent_tree._subtrees) == 0:
-                    self._parent_tree.data_size = 0
-                else:
-                    self._parent_tree.data_size = \
-                        self._parent_tree.update_data_sizes()
-                self._parent_tree = destination
-            destination.data_size = destination.update_data_sizes()
-            #temp_parent = self._parent_tree
-            #root = None
-            #while temp_parent is not None:
-                #temp_parent.data_size = \
-                    #temp_parent.update_data_sizes()
-                #if temp_parent._parent_tree is None:
-                    #root = temp_parent
-                #temp_parent = temp_parent._parent_tree
-            #root.update_rectangles(root.rect)
+            self._parent_tree = destination
+            self._update_ancestor_sizes(self.data_size)
 
     def change_size(self, factor: float) -> None:
         """Change the value of this tree's data_size attribute by <factor>.
@@ -274,6 +367,7 @@ class TMTree:
         if len(self._subtrees) != 0:
             pass
         else:
+            old_size = self.data_size
             change_size = math.ceil(self.data_size * abs(factor))
             if factor >= 0:
                 self.data_size = self.data_size + change_size
@@ -282,11 +376,25 @@ class TMTree:
                     self.data_size = 1
                 else:
                     self.data_size = self.data_size - change_size
-            #temp_parent = self._parent_tree
-            #while temp_parent is not None:
-                #temp_parent.data_size = \
-                    #temp_parent.update_data_sizes()
-                #temp_parent = temp_parent._parent_tree
+            self._update_ancestor_sizes(self.data_size - old_size)
+
+    def _update_ancestor_sizes(self, delta: int) -> None:
+        """Add <delta> to the data_size of every ancestor of this tree, so
+        that their sizes stay the sum of the sizes of their subtrees after
+        this tree changed by <delta>. The cached rectangles of this tree and
+        its ancestors are dropped.
+
+        Only the ancestors are visited, so this takes time proportional to
+        the depth of this tree, and not to the size of the whole tree.
+        """
+        self._rectangles = None
+        ancestor = self._parent_tree
+        while ancestor is not None:
+            ancestor.data_size += delta
+            ancestor._layout_stale = True
+            ancestor._hit_index = None
+            ancestor._rectangles = None
+            ancestor = ancestor._parent_tree
 
     # TODO: (Task 5) Write the methods expand, expand_all, collapse, and
     # TODO: collapse_all, and add the displayed-tree functionality to the
@@ -299,6 +407,11 @@ class TMTree:
             pass
         else:
             self._expanded = True
+            self._layout_stale = True
+            self._clear_rectangles()
+            # Lay out the subtrees, which were not while this tree was
+            # collapsed
+            self.update_rectangles(self.rect)
 
     def expand_all(self) -> None:
         """the tree corresponding to that rectangle, as well as all of its
@@ -308,9 +421,22 @@ class TMTree:
         if len(self._subtrees) == 0:
             pass
         else:
+            self._expand_subtrees()
+            self._clear_rectangles()
+            # Lay out the newly displayed trees once they are all expanded
+            self.update_rectangles(self.rect)
+
+    def _expand_subtrees(self) -> None:
+        """Expand this tree and all of its descendants which are not leaves,
+        without laying them out, but marking them as stale: a descendant
+        which was collapsed when it was last laid out does not have the
+        rectangles of its own subtrees laid out yet.
+        """
+        if len(self._subtrees) != 0:
             self._expanded = True
+            self._layout_stale = True
             for sub in self._subtrees:
-                sub.expand_all()
+                sub._expand_subtrees()
 
     def collapse(self) -> None:
         """the parent of that tree is unexpanded in the displayed-tree
@@ -322,8 +448,17 @@ class TMTree:
         else:
             self._expanded = False
             self._parent_tree._expanded = False
+        self._clear_rectangles()
+        for sub in self._subtrees:
+            sub._collapse_subtrees()
+
+    def _collapse_subtrees(self) -> None:
+        """Collapse this tree and all of its descendants.
+        """
+        self._expanded = False
+        self._rectangles = None
         for sub in self._subtrees:
-            sub.collapse()
+            sub._collapse_subtrees()
 
     def collapse_all(self) -> None:
         """the entire displayed-tree is collapsed down to just a single tree
@@ -333,6 +468,7 @@ class TMTree:
             self.collapse()
         else:
             self._expanded = False
+            self._clear_rectangles()
             temp_parent = self._parent_tree
             while temp_parent is not None:
                 temp_parent._expanded = False
@@ -17,7 +17,7 @@ concrete subclass, of course), rendering it to the user using pygame,
 and detecting user events like mouse clicks and key presses and responding
 to them.
 """
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import pygame
 from tm_trees import TMTree, FileSystemTree
 from papers import PaperTree
@@ -35,6 +35,47 @@ TREEMAP_HEIGHT = HEIGHT - FONT_HEIGHT  # The height of the treemap display.
 FONT_FAMILY = 'Consolas'
 
 
+class TreemapSurface:
+    """The surface the displayed leaves of a tree are drawn onto, kept by
+    the event loop from one frame to the next.
+
+    The surface is drawn again only when the list returned by
+    tree.get_rectangles() changes, which is whenever the displayed leaves or
+    their rectangles change, so that a frame takes the same time whatever the
+    size of the tree.
+
+    === Private Attributes ===
+    _rectangles:
+        The list returned by get_rectangles which was drawn onto _surface,
+        or None if nothing was drawn yet.
+    _surface:
+        The surface the _rectangles were drawn onto, or None if nothing was
+        drawn yet.
+    """
+    _rectangles: Optional[List[Tuple[Tuple[int, int, int, int],
+                                     Tuple[int, int, int]]]]
+    _surface: Optional[pygame.Surface]
+
+    def __init__(self) -> None:
+        """Initialize a treemap surface with nothing drawn onto it yet.
+        """
+        self._rectangles = None
+        self._surface = None
+
+    def get(self, tree: TMTree) -> pygame.Surface:
+        """Return a surface with the rectangles of the displayed leaves of
+        <tree> drawn onto it.
+        """
+        rectangles = tree.get_rectangles()
+        if rectangles is not self._rectangles:
+            self._surface = pygame.Surface((WIDTH, TREEMAP_HEIGHT))
+            for rect, colour in rectangles:
+                # Note that the arguments are in the opposite order
+                pygame.draw.rect(self._surface, colour, rect)
+            self._rectangles = rectangles
+        return self._surface
+
+
 def run_visualisation(tree: TMTree) -> None:
     """Display an interactive graphical display of the given tree's treemap.
     """
@@ -53,11 +94,15 @@ def run_visualisation(tree: TMTree) -> None:
 
 def render_display(screen: pygame.Surface, tree: Optional[TMTree],
                    selected_node: Optional[TMTree],
-                   hover_node: Optional[TMTree]) -> None:
+                   hover_node: Optional[TMTree],
+                   treemap: Optional[TreemapSurface] = None) -> None:
     """Render a treemap and text display to the given screen.
 
     Use the constants TREEMAP_HEIGHT and FONT_HEIGHT to divide the
     screen vertically into the treemap and text comments.
+
+    The treemap is taken from <treemap>, which redraws it only when it
+    changed, or drawn from scratch if <treemap> is None.
     """
     # First, clear the screen
     pygame.draw.rect(screen, pygame.color.THECOLORS['black'],
@@ -66,9 +111,9 @@ def render_display(screen: pygame.Surface, tree: Optional[TMTree],
     subscreen = screen.subsurface((0, 0, WIDTH, TREEMAP_HEIGHT))
 
     # TODO: Uncomment this afer you have completed Task 2
-    for rect, colour in tree.get_rectangles():
-        # Note that the arguments are in the opposite order
-        pygame.draw.rect(subscreen, colour, rect)
+    if treemap is None:
+        treemap = TreemapSurface()
+    subscreen.blit(treemap.get(tree), (0, 0))
 
     # add the hover rectangle
     if selected_node is not None:
@@ -104,6 +149,7 @@ def event_loop(screen: pygame.Surface, tree: TMTree) -> None:
     This loop ends only when the user closes the window.
     """
     selected_node = None
+    treemap = TreemapSurface()
 
     while True:
         # Wait for an event
@@ -122,19 +168,16 @@ def event_loop(screen: pygame.Surface, tree: TMTree) -> None:
             if event.key == pygame.K_UP:
                 # TODO: Uncomment once you have completed Task 4
                 selected_node.change_size(0.01)
-                tree.update_data_sizes()
                 tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
 
             elif event.key == pygame.K_DOWN:
                 # TODO: Uncomment once you have completed Task 4
                 selected_node.change_size(-0.01)
-                tree.update_data_sizes()
                 tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
 
             elif event.key == pygame.K_m:
                 # TODO: Uncomment once you have completed Task 4
                 selected_node.move(hover_node)
-                tree.update_data_sizes()
                 tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
 
             elif event.key == pygame.K_e:
@@ -154,7 +197,7 @@ def event_loop(screen: pygame.Surface, tree: TMTree) -> None:
                 selected_node.collapse_all()
 
         # Update display
-        render_display(screen, tree, selected_node, hover_node)
+        render_display(screen, tree, selected_node, hover_node, treemap)
 
 
 def _handle_click(button: int, pos: Tuple[int, int], tree: TMTree,
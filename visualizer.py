@@ -12,15 +12,28 @@ All of the files in this directory and all subdirectories are:
 Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import os
-import threading
 import math
 import time
-from typing import List, Tuple, Any, Optional, Union, Callable
+from typing import List, Tuple, Any, Optional, Union, Callable, Iterable
 from tkinter import *
 import pygame
 from call import Drawable, Call
 from customer import Customer
-from filter import DurationFilter, CustomerFilter, LocationFilter, ResetFilter
+from filter import Filter, DurationFilter, CustomerFilter, LocationFilter, \
+    ResetFilter, ExpressionFilter, DateRangeFilter
+from filterpool import FilterPool
+from filtercache import FilterCache
+from filterjob import FilterJob
+from spatialindex import LooseQuadtree, clip_segment
+from linebatch import LineBatch, draw_segments
+from framestats import FrameStats
+from playback import Playback, FadingLayer, FADE_BANDS
+from mappyramid import MapPyramid
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """
 === Module Description ===
@@ -51,6 +64,52 @@ MAP_MAX = (-79.196382, 43.576959)
 
 # Window size
 SCREEN_SIZE = (1000, 700)
+# Margin in pixels around the screen within which drawables are still
+# rendered, covering the size of the sprites
+VIEW_MARGIN = 16
+# Margin in pixels around the screen to which lines are clipped
+CLIP_MARGIN = 2
+
+# Number of visible calls above which a heatmap is rendered instead of the
+# drawables, when zoomed in and when fully zoomed out. Each sprite in the view
+# counts as half a call, since every call has a sprite at both of its ends.
+HEATMAP_THRESHOLD = 25000
+HEATMAP_ZOOMED_OUT_THRESHOLD = 5000
+# Size in pixels of the heatmap cells
+HEATMAP_CELL = 4
+# Colours of the least and the most dense heatmap cells
+HEATMAP_LOW = (0, 64, 125)
+HEATMAP_HIGH = (255, 48, 0)
+
+# Largest number of drawables rasterized into an overlay of the whole map
+OVERLAY_MAX_DRAWABLES = 30000
+# Largest overlay in pixels, four screens (zoom levels up to 2): further in,
+# the visible drawables are rendered onto the view in every frame instead
+OVERLAY_MAX_PIXELS = 4 * SCREEN_SIZE[0] * SCREEN_SIZE[1]
+# Largest number of drawables rendered in a draft frame, while the map is
+# being panned or zoomed
+DRAFT_MAX_DRAWABLES = 4000
+# Time in seconds after the last pan or zoom at which the map is rendered at
+# full quality again
+GESTURE_END = 0.15
+# Position of the filter status line in the side panel
+STATUS_POSITION = (SCREEN_SIZE[0] + 10, 500)
+
+# Maximum number of frames drawn per second
+MAX_FPS = 60
+# Longest time in milliseconds to wait for user input while nothing changes
+IDLE_WAIT = 250
+# Events telling that the window has to be drawn again
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.ACTIVEEVENT)
+
+# File the frame and filter timings are saved to
+STATS_FILE = 'frame_stats.json'
+# Width in pixels of the timing overlay
+STATS_WIDTH = 330
+
+# Longest time in seconds played back between two frames, so that a stalled
+# frame does not skip a part of the playback
+MAX_PLAYBACK_STEP = 0.1
 
 
 class Visualizer:
@@ -65,10 +124,50 @@ class Visualizer:
     #   on the pygame window.
     # _map: the Map object responsible for converting between longitude/latitude
     #   coordinates and the pixels of the visualization window.
+    # _pool: the FilterPool used to apply the filters selected by the user.
+    # _cache: the FilterCache holding the results of recent filters.
+    # _history: the filters applied so far, as (filter, filter string, input
+    #   calls) steps; the first step, with no filter, holds the initial calls.
+    # _history_pos: the position in <_history> of the step currently shown.
+    # _job: the filter running in the background, or None if there is none.
+    # _replay_to: the step of <_history> replayed by <_job>, which is shown
+    #   once the job is done, or None if <_job> applies a new filter.
+    # _font: the font of the side panel.
+    # _status: the text on the status line of the side panel.
+    # _dirty: whether the window has changed since it was last drawn.
+    # _clock: the clock limiting the frame rate.
+    # _pending: the user input events received while waiting for a frame,
+    #   which are not handled yet.
+    # _stats: the timings of the recent frames and filters.
+    # _show_stats: whether the timing overlay is shown on the map.
+    # _playback: the playback of the shown calls, or None if they are shown
+    #   all at once.
+    # _played_at: the time the playback was last rendered at.
+    # _gesture_until: the time until which the map is rendered as a draft,
+    #   as it is being panned or zoomed.
+    # _drafted: whether the window was last drawn as a draft, so that it has
+    #   to be drawn at full quality once the gesture ends.
     _uiscreen: pygame.Surface
     _screen: pygame.Surface
     _mouse_down: bool
     _map: 'Map'
+    _pool: FilterPool
+    _cache: FilterCache
+    _history: List[Tuple[Optional[Filter], str, List[Call]]]
+    _history_pos: int
+    _job: Optional[FilterJob]
+    _replay_to: Optional[int]
+    _font: pygame.font.Font
+    _status: str
+    _dirty: bool
+    _clock: pygame.time.Clock
+    _pending: List[pygame.event.Event]
+    _stats: FrameStats
+    _show_stats: bool
+    _playback: Optional[Playback]
+    _played_at: float
+    _gesture_until: float
+    _drafted: bool
     _quit: bool
     r: Tk
 
@@ -96,16 +195,48 @@ class Visualizer:
                             (SCREEN_SIZE[0] + 10, 150))
         self._uiscreen.blit(font.render("L: location", True, WHITE),
                             (SCREEN_SIZE[0] + 10, 200))
-        self._uiscreen.blit(font.render("R: reset filter", True, WHITE),
+        self._uiscreen.blit(font.render("T: date range", True, WHITE),
                             (SCREEN_SIZE[0] + 10, 250))
+        self._uiscreen.blit(font.render("R: reset filter", True, WHITE),
+                            (SCREEN_SIZE[0] + 10, 300))
+        self._uiscreen.blit(font.render("E: combine filters", True, WHITE),
+                            (SCREEN_SIZE[0] + 10, 350))
+        self._uiscreen.blit(font.render("Left/Right: history", True, WHITE),
+                            (SCREEN_SIZE[0] + 10, 400))
+        self._uiscreen.blit(font.render("Esc: cancel filter", True, WHITE),
+                            (SCREEN_SIZE[0] + 10, 450))
 
+        self._uiscreen.blit(font.render("I: timing overlay", True, WHITE),
+                            (SCREEN_SIZE[0] + 10, 550))
+        self._uiscreen.blit(font.render("S: save timings", True, WHITE),
+                            (SCREEN_SIZE[0] + 10, 600))
         self._uiscreen.blit(font.render("M: monthly bill", True, WHITE),
                             (SCREEN_SIZE[0] + 10, 650))
+        self._uiscreen.blit(font.render("P: playback, +/-: speed", True,
+                                        WHITE),
+                            (SCREEN_SIZE[0] + 10, 675))
 
         self._screen = self._uiscreen.subsurface((0, 0), SCREEN_SIZE)
         self._screen.fill(WHITE)
         self._mouse_down = False
         self._map = Map(SCREEN_SIZE)
+        self._pool = FilterPool()
+        self._cache = FilterCache()
+        self._history = []
+        self._history_pos = 0
+        self._job = None
+        self._replay_to = None
+        self._font = font
+        self._status = ''
+        self._dirty = True
+        self._clock = pygame.time.Clock()
+        self._pending = []
+        self._stats = FrameStats()
+        self._show_stats = False
+        self._playback = None
+        self._played_at = 0.0
+        self._gesture_until = 0.0
+        self._drafted = False
 
         # Initial render
         self.render_drawables([])
@@ -114,15 +245,61 @@ class Visualizer:
     def render_drawables(self, drawables: List[Drawable]) -> None:
         """Render the <drawables> to the screen
         """
-        # Draw the background map onto the screen
-        self._screen.fill(WHITE)
-        self._screen.blit(self._map.get_current_view(), (0, 0))
-
-        # Add all of the objects onto the screen
-        self._map.render_objects(drawables, self._screen)
+        # Draw the background map and all of the objects onto the screen,
+        # or the calls shown by the playback. While the map is being panned
+        # or zoomed, a draft is rendered instead.
+        draft = time.perf_counter() < self._gesture_until
+        if self._playback is None:
+            self._map.render(drawables, self._screen, self._stats, draft)
+        else:
+            now = time.perf_counter()
+            self._map.render_playback(
+                self._playback, min(now - self._played_at, MAX_PLAYBACK_STEP),
+                self._screen, self._stats)
+            self._played_at = now
+            if self._playback.finished():
+                self._playback = None
+                self._show_status("")
+            elif self._job is None:
+                self._show_status("{:%Y-%m-%d %H:%M}".format(
+                    self._playback.now))
+        if self._show_stats:
+            self._draw_stats()
 
         # Show the new image
+        start = time.perf_counter()
         pygame.display.flip()
+        self._stats.add('flip', time.perf_counter() - start)
+        # Only the frames which are rendered are recorded: the frame started
+        # by an iteration which renders nothing is dropped by the next one
+        self._stats.end_frame()
+        # Keep the timing overlay and the playback going while they are
+        # shown
+        self._dirty = self._show_stats or self._playback is not None
+        self._drafted = draft
+
+    def needs_redraw(self) -> bool:
+        """Return whether the window has changed since it was last drawn, or
+        was drawn as a draft and the gesture has ended.
+        """
+        return self._dirty or (self._drafted and
+                               time.perf_counter() >= self._gesture_until)
+
+    def wait_frame(self) -> None:
+        """Wait until the next frame is due, drawing at most MAX_FPS frames
+        per second. While nothing changes and no filter is running, wait for
+        user input instead, for at most IDLE_WAIT milliseconds, or until the
+        gesture ends if a draft is shown.
+        """
+        self._clock.tick(MAX_FPS)
+        if not self._dirty and self._job is None and not self._pending:
+            timeout = IDLE_WAIT
+            if self._drafted:
+                timeout = max(1, min(timeout, math.ceil(
+                    (self._gesture_until - time.perf_counter()) * 1000)))
+            event = pygame.event.wait(timeout)
+            if event.type != pygame.NOEVENT:
+                self._pending.append(event)
 
     def has_quit(self) -> bool:
         """Returns if the program has received the quit command
@@ -137,13 +314,65 @@ class Visualizer:
         <customers> list contains all customers from the input data.
         Return a new list of Calls, according to user input actions.
         """
-        new_drawables = drawables
-        for event in pygame.event.get():
+        self._stats.start_frame()
+        start = time.perf_counter()
+        new_drawables = self._handle_events(customers, drawables)
+        self._stats.add('events', time.perf_counter() - start)
+        return new_drawables
+
+    def _handle_events(self, customers: List[Customer],
+                       drawables: List[Call]) -> List[Call]:
+        """Handle the user events as described in handle_window_events.
+        """
+        if len(self._history) == 0:
+            self._history.append((None, '', drawables))
+        new_drawables = self._poll_filter(customers, drawables)
+        events = self._pending + pygame.event.get()
+        self._pending = []
+        for event in events:
             if event.type == pygame.QUIT:
                 self._quit = True
+                self._cancel_filter()
+                self._pool.close()
             elif event.type == pygame.KEYDOWN:
                 f = None
-                num_threads = 1
+
+                # Stop the filter running in the background
+                if event.key == pygame.K_ESCAPE and self._job is not None:
+                    self._job.cancel()
+                    self._show_status("Cancelling filter...")
+
+                # Replay the previous or the next step of the filter history,
+                # counting from the step being replayed, if any
+                shown = self._history_pos if self._replay_to is None \
+                    else self._replay_to
+                if event.key == pygame.K_LEFT and shown > 0:
+                    new_drawables = self._replay(customers, new_drawables,
+                                                 shown - 1)
+                elif event.key == pygame.K_RIGHT and \
+                        shown < len(self._history) - 1:
+                    new_drawables = self._replay(customers, new_drawables,
+                                                 shown + 1)
+
+                # Show or hide the timing overlay, or save the timings
+                if event.unicode == "i":
+                    self._show_stats = not self._show_stats
+                    self._dirty = True
+                elif event.unicode == "s":
+                    self._stats.export(STATS_FILE)
+                    print("Saved timing statistics to " + STATS_FILE)
+
+                # Start or stop the playback of the shown calls, or change
+                # its speed
+                if event.unicode == "p":
+                    self._toggle_playback(drawables)
+                elif event.unicode in ("+", "=") and \
+                        self._playback is not None:
+                    self._playback.speed *= 2
+                    print("Playback speed:", self._playback.speed)
+                elif event.unicode == "-" and self._playback is not None:
+                    self._playback.speed /= 2
+                    print("Playback speed:", self._playback.speed)
 
                 if event.unicode == "d":
                     f = DurationFilter()
@@ -151,63 +380,29 @@ class Visualizer:
                     f = LocationFilter()
                 elif event.unicode == "c":
                     f = CustomerFilter()
+                elif event.unicode == "t":
+                    f = DateRangeFilter()
                 elif event.unicode == "r":
                     f = ResetFilter()
-                    num_threads = 1
+                elif event.unicode == "e":
+                    f = ExpressionFilter()
 
                 if f is not None:
-                    def result_wrapper(fun: Callable[[List[Customer],
-                                                      List[Call],
-                                                      str], List[Call]],
-                                       customers: List[Customer],
-                                       data: List[Call],
-                                       filter_string: str,
-                                       res: List) -> None:
-                        """A final wrapper to return the result of the operation
-                        """
-                        res.append(fun(customers, data, filter_string))
-
-                    def threading_wrapper(customers: List[Customer],
-                                          data: List[Call],
-                                          filter_string: str) -> List[Call]:
-                        """A wrapper for the application of filters with
-                        threading
+                    def pool_wrapper(customers: List[Customer],
+                                     data: List[Call],
+                                     filter_string: str) -> List[Call]:
+                        """A wrapper taking the result of the filter from the
+                        filter cache, or else starting the filter in the
+                        background; the calls shown do not change until the
+                        filter is done
                         """
-                        chunk_sz_calls = math.ceil(
-                            (len(data) + num_threads - 1) / num_threads)
-                        print("Num_threads:", num_threads)
-                        print("Chunk_calls:", chunk_sz_calls)
-                        threads = []
-                        results = []
-                        for i in range(num_threads):
-                            res = []
-                            results.append(res)
-                            t = threading.Thread(target=result_wrapper,
-                                                 args=
-                                                 (f.apply,
-                                                  customers,
-                                                  data[i*chunk_sz_calls:
-                                                       (i+1)*chunk_sz_calls],
-                                                  filter_string,
-                                                  res))
-                            t.daemon = True
-                            t.start()
-                            threads.append(t)
-                            # f.apply(customers, data, filter_string)
-                        # Wait to finish
-                        for t in threads:
-                            t.join()
-
-                        # Now reconstruct the data
-                        new_data = []
-                        for res in results:
-                            new_data.extend(res[0])
-                        return new_data
+                        return self._start_filter(f, customers, data,
+                                                  filter_string)
 
                     new_drawables = self.entry_window(str(f),
                                                       customers,
-                                                      drawables,
-                                                      threading_wrapper)
+                                                      new_drawables,
+                                                      pool_wrapper)
 
                 # Perform the billing for a selected customer:
                 if event.unicode == "m":
@@ -267,17 +462,170 @@ class Visualizer:
                     self._mouse_down = True
                 elif event.button == 4:
                     self._map.zoom(-0.1)
+                    self._start_gesture()
                 elif event.button == 5:
                     self._map.zoom(0.1)
+                    self._start_gesture()
             elif event.type == pygame.MOUSEBUTTONUP:
                 self._mouse_down = False
             elif event.type == pygame.MOUSEMOTION:
                 if self._mouse_down:
                     self._map.pan(pygame.mouse.get_rel())
+                    self._start_gesture()
                 else:
                     pygame.mouse.get_rel()
+            elif event.type in EXPOSE_EVENTS:
+                self._dirty = True
+        if new_drawables is not drawables:
+            self._dirty = True
+            # Play the new calls back instead
+            if self._playback is not None:
+                self._playback = Playback(new_drawables, self._playback.speed)
         return new_drawables
 
+    def _start_gesture(self) -> None:
+        """Record that the map was just panned or zoomed, so that it is
+        rendered as a draft until GESTURE_END seconds after the last pan or
+        zoom.
+        """
+        self._gesture_until = time.perf_counter() + GESTURE_END
+        self._dirty = True
+
+    def _toggle_playback(self, calls: List[Call]) -> None:
+        """Start playing back the <calls> in chronological order, or stop the
+        playback if one is running.
+        """
+        if self._playback is None:
+            self._playback = Playback(calls)
+            self._played_at = time.perf_counter()
+        else:
+            self._playback = None
+            self._show_status("")
+        self._dirty = True
+
+    def _start_filter(self, f: Filter, customers: List[Customer],
+                      data: List[Call], filter_string: str) -> List[Call]:
+        """Return the result of the filter <f> with <filter_string> on <data>
+        if it is cached, and otherwise start applying it in the background
+        and return <data>. Any filter still running is cancelled.
+        """
+        self._cancel_filter()
+        result = self._cache.lookup(f, customers, data, filter_string)
+        if result is not None:
+            self._record(f, filter_string, data)
+            return result
+        self._job = FilterJob(f, customers, data, filter_string, self._pool)
+        self._show_status("Filtering... 0%")
+        return data
+
+    def _poll_filter(self, customers: List[Customer],
+                     drawables: List[Call]) -> List[Call]:
+        """Return the result of the filter running in the background if it is
+        done, and otherwise the calls currently shown, <drawables>, updating
+        the progress shown in the side panel.
+        """
+        job = self._job
+        if job is None:
+            return drawables
+        if not job.done():
+            if not job.cancelled():
+                self._show_status("Filtering... {}%".format(
+                    int(job.progress() * 100)))
+            return drawables
+
+        self._job = None
+        replay_to = self._replay_to
+        self._replay_to = None
+        if job.cancelled():
+            self._show_status("Filter cancelled")
+            return drawables
+        try:
+            result = job.result()
+        except Exception as error:
+            print("ERROR: the filter failed: " + repr(error))
+            self._show_status("Filter failed")
+            return drawables
+        print("Time elapsed:  " + str(job.elapsed))
+        print("FILTER APPLIED")
+        self._stats.record_filter(job.elapsed, len(result))
+        self._cache.store(job.f, customers, job.data, job.filter_string,
+                          result)
+        if replay_to is None:
+            self._record(job.f, job.filter_string, job.data)
+        else:
+            self._history_pos = replay_to
+        self._show_status("")
+        return result
+
+    def _cancel_filter(self) -> None:
+        """Cancel the filter running in the background, if any, and wait
+        until it stops.
+        """
+        if self._job is not None:
+            self._job.cancel()
+            self._job.wait()
+            self._job = None
+            self._replay_to = None
+            self._show_status("")
+
+    def _record(self, f: Filter, filter_string: str,
+                data: List[Call]) -> None:
+        """Record the filter <f> applied with <filter_string> to <data> as the
+        next step of the filter history, dropping the steps after the current
+        one.
+        """
+        del self._history[self._history_pos + 1:]
+        self._history.append((f, filter_string, data))
+        self._history_pos += 1
+
+    def _show_status(self, text: str) -> None:
+        """Show <text> on the status line of the side panel.
+        """
+        if text == self._status:
+            return
+        self._status = text
+        self._dirty = True
+        self._uiscreen.fill((125, 125, 125),
+                            (STATUS_POSITION, (190, 30)))
+        self._uiscreen.blit(self._font.render(text, True, WHITE),
+                            STATUS_POSITION)
+
+    def _draw_stats(self) -> None:
+        """Draw the timing overlay, summarizing the recent frames and
+        filters, onto the top-left corner of the map.
+        """
+        lines = self._stats.lines()
+        height = self._font.get_linesize()
+        box = pygame.Surface((STATS_WIDTH, height * len(lines) + 10))
+        box.set_alpha(200)
+        self._screen.blit(box, (5, 5))
+        for i, line in enumerate(lines):
+            self._screen.blit(self._font.render(line, True, WHITE),
+                              (10, 10 + i * height))
+
+    def _replay(self, customers: List[Customer], drawables: List[Call],
+                pos: int) -> List[Call]:
+        """Show the step <pos> of the filter history and return its calls if
+        they are at hand: the initial calls, or a result still in the filter
+        cache. Otherwise, start applying the filter of that step again in the
+        background, and return the calls currently shown, <drawables>; the
+        step is shown once the filter is done, and the current one is kept
+        if it is cancelled or fails. Any filter still running is cancelled.
+        """
+        self._cancel_filter()
+        f, filter_string, data = self._history[pos]
+        if f is not None:
+            result = self._cache.lookup(f, customers, data, filter_string)
+            if result is None:
+                self._job = FilterJob(f, customers, data, filter_string,
+                                      self._pool)
+                self._replay_to = pos
+                self._show_status("Filtering... 0%")
+                return drawables
+            data = result
+        self._history_pos = pos
+        return data
+
     def entry_window(self, field: str,
                      customers: List[Customer],
                      drawables: Union[List[Customer],
@@ -303,14 +651,12 @@ class Visualizer:
         # The callback function:
         def callback_wrapper(input_string: str) -> None:
             """ A wrapper to call the callback function on the <input_string>
-            and print the time taken for the function to execute.
+            and close the pop-up window. The time taken by the filter is
+            printed once it is applied, as it runs in the background.
             """
             nonlocal new_drawables
             nonlocal m
-            t1 = time.time()
             new_drawables = callback(customers, drawables, input_string)
-            t2 = time.time()
-            print("Time elapsed:  " + str(t2 - t1))
             m.destroy()
 
         Button(m, text="Apply Filter",
@@ -321,7 +667,8 @@ class Visualizer:
                                 else "")).grid(row=1, column=0,
                                                sticky=W, pady=5)
         m.mainloop()
-        print("FILTER APPLIED")
+        # The pop-up window may have covered the map
+        self._dirty = True
         return new_drawables
 
 
@@ -345,6 +692,66 @@ class Map:
     #    offset on y axis
     # _zoom:
     #    map zoom level
+    # _view:
+    #    the scaled subimage shown for the current transformation, or None if
+    #    it was not built yet
+    # _view_key:
+    #    the (zoom, xoffset, yoffset) transformation <_view> was built for
+    # _pyramid:
+    #    the tiles of the map image pre-scaled to the zoom levels, which the
+    #    views are cropped from
+    # _drawn:
+    #    the list of drawables whose points are stored in <_locations>, or
+    #    None if there is none
+    # _drawn_size:
+    #    the length of <_drawn> when <_locations> was built
+    # _sprites:
+    #    the sprite drawables of <_drawn>
+    # _lines:
+    #    the distinct segments of the line drawables of <_drawn>
+    # _locations:
+    #    the long/lat coordinates of the points of the items to render, in
+    #    order: the position of each of <_sprites>, then both ends of each
+    #    segment of <_lines>
+    # _weights:
+    #    the weight of each point of <_locations> in the heatmap: 1 for each
+    #    sprite, and 0 for the ends of the segments, whose calls are already
+    #    counted by their sprites
+    # _tree:
+    #    the spatial index over the bounding boxes of the items to render:
+    #    item i is _sprites[i] if i < len(_sprites), and otherwise the segment
+    #    i - len(_sprites) of <_lines>
+    # _visible:
+    #    the items in the current view, in increasing order
+    # _positions:
+    #    the pixel coordinates of the points of the <_visible> items, or None
+    #    if they are not computed yet
+    # _positions_key:
+    #    the transformation <_visible> and <_positions> were computed for
+    # _heatmap:
+    #    the heatmap of the points of <_drawn> in the current view, or None if
+    #    there are too few visible points for a heatmap
+    # _heatmap_key:
+    #    the transformation <_heatmap> was computed for, or None if it was not
+    #    computed yet
+    # _overlay:
+    #    the whole map at the current zoom level with <_drawn> rendered onto
+    #    it, or None if it was not built yet
+    # _overlay_zoom:
+    #    the zoom level <_overlay> was built for
+    # _rendered_key:
+    #    the transformation of the last frame rendered at full quality, or
+    #    None if there is none
+    # _draft_items:
+    #    the sample of the items to render which is drawn in draft frames, or
+    #    None if it was not chosen yet
+    # _draft_points:
+    #    the indices in <_locations> of the points of <_draft_items>
+    # _layer:
+    #    the layer the calls of a playback are drawn onto, or None if no
+    #    playback was rendered yet
+    # _layer_key:
+    #    the playback, the zoom level and the offsets <_layer> was drawn for
     image: pygame.image
     min_coords: Tuple[float, float]
     max_coords: Tuple[float, float]
@@ -352,12 +759,34 @@ class Map:
     _xoffset: int
     _yoffset: int
     _zoom: int
+    _view: Optional[pygame.Surface]
+    _view_key: Tuple[float, int, int]
+    _pyramid: MapPyramid
+    _drawn: Optional[List[Drawable]]
+    _drawn_size: int
+    _sprites: List[Drawable]
+    _lines: LineBatch
+    _locations: Any
+    _weights: Any
+    _tree: LooseQuadtree
+    _visible: List[int]
+    _positions: Optional[List[Tuple[int, int]]]
+    _heatmap: Optional[pygame.Surface]
+    _heatmap_key: Optional[Tuple[float, int, int]]
+    _overlay: Optional[pygame.Surface]
+    _overlay_zoom: float
+    _rendered_key: Optional[Tuple[float, int, int]]
+    _positions_key: Tuple[float, int, int]
+    _draft_items: Optional[List[int]]
+    _draft_points: Any
+    _layer: Optional[FadingLayer]
+    _layer_key: Optional[Tuple[Playback, float, int, int]]
 
     def __init__(self, screendims: Tuple[int, int]) -> None:
         """ Initialize this map for the given screen dimensions <screendims>.
         """
-        self.image = pygame.image.load(
-            os.path.join(os.path.dirname(__file__), MAP_FILE))
+        image_file = os.path.join(os.path.dirname(__file__), MAP_FILE)
+        self.image = pygame.image.load(image_file)
         self.min_coords = MAP_MIN
         self.max_coords = MAP_MAX
 
@@ -365,22 +794,444 @@ class Map:
         self._yoffset = 0
         self._zoom = 1
         self.screensize = screendims
+        self._view = None
+        self._view_key = (self._zoom, self._xoffset, self._yoffset)
+        self._pyramid = MapPyramid(self.image, image_file, screendims)
+        self._drawn = None
+        self._drawn_size = 0
+        self._sprites = []
+        self._lines = LineBatch([])
+        self._locations = []
+        self._weights = []
+        self._tree = LooseQuadtree([])
+        self._visible = []
+        self._positions = None
+        self._heatmap = None
+        self._heatmap_key = None
+        self._overlay = None
+        self._overlay_zoom = self._zoom
+        self._rendered_key = None
+        self._positions_key = self._view_key
+        self._draft_items = None
+        self._draft_points = []
+        self._layer = None
+        self._layer_key = None
+
+    def render(self, drawables: List[Drawable], screen: pygame.Surface,
+               stats: Optional[FrameStats] = None,
+               draft: bool = False) -> None:
+        """ Render the current view of the map and the <drawables> onto the
+        <screen>, adding the time spent on the map view and on the drawables
+        to the 'view' and 'objects' stages of <stats>, unless it is None.
+
+        Once the view is panned, up to OVERLAY_MAX_DRAWABLES drawables are
+        rendered together with the whole map at the current zoom level, into
+        an overlay of at most OVERLAY_MAX_PIXELS pixels; while the view is
+        only panned, the visible part of the overlay is blitted. Zooming does
+        not build an overlay, so that each zoom step costs a single frame.
+
+        If <draft> is True, the frame is rendered quickly at a lower quality
+        instead, unless the overlay for the current zoom level is ready: see
+        _render_draft.
+        """
+        start = time.perf_counter()
+        if drawables is not self._drawn or \
+                len(drawables) != self._drawn_size:
+            self._index_drawables(drawables)
+        overlaid = numpy is not None and \
+            len(drawables) <= OVERLAY_MAX_DRAWABLES and \
+            self.screensize[0] * self.screensize[1] * self._zoom ** 2 <= \
+            OVERLAY_MAX_PIXELS
+        if draft and not (overlaid and self._overlay is not None and
+                          self._overlay_zoom == self._zoom):
+            self._render_draft(screen, stats)
+            return
+        key = (self._zoom, self._xoffset, self._yoffset)
+        panned = self._rendered_key is not None and \
+            self._rendered_key[0] == self._zoom and self._rendered_key != key
+        self._rendered_key = key
+        if overlaid and self._get_heatmap() is None and \
+                (panned or (self._overlay is not None and
+                            self._overlay_zoom == self._zoom)):
+            if self._overlay is None or self._overlay_zoom != self._zoom:
+                self._overlay = self._build_overlay(drawables)
+                self._overlay_zoom = self._zoom
+            built = time.perf_counter()
+            shift = (round(self._xoffset * self._zoom * self.screensize[0] /
+                           self.image.get_width()),
+                     round(self._yoffset * self._zoom * self.screensize[1] /
+                           self.image.get_height()))
+            screen.fill(WHITE)
+            screen.blit(self._overlay, (0, 0), (shift, self.screensize))
+            if stats is not None:
+                stats.add('objects', built - start)
+                stats.add('view', time.perf_counter() - built)
+            return
+        screen.blit(self.get_current_view(), (0, 0))
+        viewed = time.perf_counter()
+        self.render_objects(drawables, screen)
+        if stats is not None:
+            stats.add('view', viewed - start)
+            stats.add('objects', time.perf_counter() - viewed)
+
+    def _render_draft(self, screen: pygame.Surface,
+                      stats: Optional[FrameStats]) -> None:
+        """ Render a draft of the current view of the map and of the indexed
+        drawables onto the <screen>, adding the time spent to <stats> as
+        render does.
+
+        The map is scaled without smoothing, the heatmap is never rendered,
+        at most DRAFT_MAX_DRAWABLES evenly spread drawables are drawn, and
+        lines are neither anti-aliased nor widened.
+        """
+        start = time.perf_counter()
+        key = (self._zoom, self._xoffset, self._yoffset)
+        if self._view is not None and key == self._view_key:
+            screen.blit(self._view, (0, 0))
+        else:
+            raw_width = self.image.get_width()
+            raw_height = self.image.get_height()
+            mapsegment = self.image.subsurface(
+                ((self._xoffset, self._yoffset),
+                 (round(raw_width / self._zoom),
+                  round(raw_height / self._zoom))))
+            screen.blit(pygame.transform.scale(mapsegment, self.screensize),
+                        (0, 0))
+        viewed = time.perf_counter()
+
+        if self._draft_items is None:
+            item_count = len(self._sprites) + len(self._lines)
+            self._draft_items = list(range(
+                0, item_count,
+                math.ceil(item_count / DRAFT_MAX_DRAWABLES) or 1))
+            sprite_count = len(self._sprites)
+            points = []
+            for item in self._draft_items:
+                if item < sprite_count:
+                    points.append(item)
+                else:
+                    points.append(2 * item - sprite_count)
+                    points.append(2 * item - sprite_count + 1)
+            self._draft_points = points
+        if numpy is None:
+            positions = [self._longlat_to_screen(self._locations[point])
+                         for point in self._draft_points]
+        else:
+            positions = self._project(self._locations[numpy.array(
+                self._draft_points, dtype=int)]).tolist()
+
+        sprite_count = len(self._sprites)
+        blits = []
+        segments = []
+        i = 0
+        for item in self._draft_items:
+            if item < sprite_count:
+                blits.append((self._sprites[item].sprite, positions[i]))
+                i += 1
+            else:
+                segments.append((positions[i], positions[i + 1]))
+                i += 2
+        screen.blits(blits, doreturn=False)
+        for segment_start, segment_end in segments:
+            pygame.draw.line(screen, LINE_COLOUR, segment_start, segment_end)
+        if stats is not None:
+            stats.add('view', viewed - start)
+            stats.add('objects', time.perf_counter() - viewed)
+
+    def render_playback(self, playback: Playback, seconds: float,
+                        screen: pygame.Surface,
+                        stats: Optional[FrameStats] = None) -> None:
+        """ Play <seconds> more of the <playback>, and render the current view
+        of the map and the calls shown by the <playback> onto the <screen>,
+        adding the time spent to <stats> as render does.
+
+        Only the calls which started are drawn onto the playback layer, which
+        fades the older calls out; the layer is only drawn again in full
+        when the view is panned or zoomed, or another playback is rendered.
+        """
+        start = time.perf_counter()
+        started = playback.advance(seconds)
+        key = (playback, self._zoom, self._xoffset, self._yoffset)
+        if self._layer is None or key != self._layer_key:
+            # Draw the shown calls from the oldest to the newest, fading the
+            # older ones as they would have been faded while playing
+            self._layer = FadingLayer(self.screensize)
+            self._layer_key = key
+            for band in playback.shown_by_age(FADE_BANDS):
+                self._layer.fade(1 / FADE_BANDS)
+                self.draw_calls(self._layer.surface, band)
+        else:
+            self._layer.fade(seconds * playback.speed / playback.window)
+            self.draw_calls(self._layer.surface, started)
+        drawn = time.perf_counter()
+        screen.blit(self.get_current_view(), (0, 0))
+        screen.blit(self._layer.surface, (0, 0))
+        if stats is not None:
+            stats.add('objects', drawn - start)
+            stats.add('view', time.perf_counter() - drawn)
+
+    def draw_calls(self, surface: pygame.Surface, calls: List[Call]) -> None:
+        """ Draw the sprites and the connection lines of the <calls> onto the
+        <surface>, in the current view, without indexing them.
+        """
+        sprites = []
+        locations = []
+        for call in calls:
+            for drawable in call.get_drawables():
+                sprites.append(drawable.sprite)
+                locations.append(drawable.get_position())
+        for call in calls:
+            locations.extend(call.get_connection().get_linelimits())
+        if numpy is None:
+            positions = [self._longlat_to_screen(location)
+                         for location in locations]
+        elif locations:
+            positions = self._project(numpy.array(
+                locations, dtype=float).reshape(-1, 2)).tolist()
+        else:
+            return
+
+        surface.blits(list(zip(sprites, positions)), doreturn=False)
+        clip_box = (-CLIP_MARGIN, -CLIP_MARGIN,
+                    self.screensize[0] + CLIP_MARGIN,
+                    self.screensize[1] + CLIP_MARGIN)
+        segments = []
+        for i in range(len(sprites), len(positions), 2):
+            segment = clip_segment(positions[i], positions[i + 1], clip_box)
+            if segment is not None:
+                segments.append((segment[0], segment[1], 1))
+        draw_segments(surface, LINE_COLOUR, segments)
+
+    def _build_overlay(self, drawables: List[Drawable]) -> pygame.Surface:
+        """ Return the whole map, scaled to the current zoom level, with the
+        <drawables> rendered onto it.
+
+        The map is assembled from the tiles of the map pyramid.
+
+        Precondition: the points of <drawables> are stored in <_locations>.
+        """
+        overlay = self._pyramid.whole(self._zoom)
+        positions = self._project(self._locations, (0, 0)).tolist()
+        self._draw_items(overlay, range(len(self._sprites) + len(self._lines)),
+                         positions, None)
+        return overlay
 
     def render_objects(self, drawables: List[Drawable],
                        screen: pygame.Surface) -> None:
         """ Render the <drawables> onto the <screen>.
+
+        Only the drawables in the visible region of the map are rendered,
+        and lines are clipped to the screen. The lines are drawn on top of
+        the sprites, and lines between the same two locations are drawn
+        once, wider. When too many points are visible, a heatmap of their
+        density is rendered instead.
         """
-        for drawable in drawables:
+        if drawables is not self._drawn or \
+                len(drawables) != self._drawn_size:
+            self._index_drawables(drawables)
+        heatmap = self._get_heatmap()
+        if heatmap is not None:
+            screen.blit(heatmap, (0, 0))
+            return
+
+        visible, positions = self._visible_positions(drawables)
+        self._draw_items(screen, visible, positions,
+                         (-CLIP_MARGIN, -CLIP_MARGIN,
+                          self.screensize[0] + CLIP_MARGIN,
+                          self.screensize[1] + CLIP_MARGIN))
+
+    def _draw_items(self, surface: pygame.Surface, items: Iterable[int],
+                    positions: List[Tuple[int, int]],
+                    clip_box: Optional[Tuple[int, int, int, int]]) -> None:
+        """ Draw the <items> onto the <surface>, with their points at the
+        pixel coordinates <positions>: all sprites in one batch of blits,
+        then all segments, clipped to <clip_box> unless it is None.
+        """
+        sprite_count = len(self._sprites)
+        blits = []
+        segments = []
+        i = 0
+        for item in items:
+            if item < sprite_count:
+                blits.append((self._sprites[item].sprite, positions[i]))
+                i += 1
+            else:
+                segment = (positions[i], positions[i + 1])
+                if clip_box is not None:
+                    segment = clip_segment(segment[0], segment[1], clip_box)
+                if segment is not None:
+                    segments.append((segment[0], segment[1],
+                                     self._lines.width(item - sprite_count)))
+                i += 2
+        surface.blits(blits, doreturn=False)
+        draw_segments(surface, LINE_COLOUR, segments)
+
+    def _visible_positions(self, drawables: List[Drawable]) \
+            -> Tuple[List[int], List[Tuple[int, int]]]:
+        """ Return the items to render from <drawables> (see _tree) in the
+        visible region of the map, in increasing order, and the pixel
+        coordinates of their points: the position of each sprite, and both
+        ends of each segment, in order.
+
+        The visible items are found with a spatial index, and their points
+        are projected all at once. Both are kept until the view is panned or
+        zoomed, or other drawables are rendered.
+        """
+        if drawables is not self._drawn or \
+                len(drawables) != self._drawn_size:
+            self._index_drawables(drawables)
+
+        key = (self._zoom, self._xoffset, self._yoffset)
+        if self._positions is None or key != self._positions_key:
+            self._visible = self._tree.query(*self._visible_region())
+            sprite_count = len(self._sprites)
+            points = []
+            for item in self._visible:
+                if item < sprite_count:
+                    points.append(item)
+                else:
+                    first = 2 * item - sprite_count
+                    points.append(first)
+                    points.append(first + 1)
+            if numpy is None:
+                self._positions = [self._longlat_to_screen(
+                    self._locations[point]) for point in points]
+            else:
+                self._positions = self._project(
+                    self._locations[numpy.array(points, dtype=int)]).tolist()
+            self._positions_key = key
+        return self._visible, self._positions
+
+    def _index_drawables(self, drawables: List[Drawable]) -> None:
+        """ Split <drawables> into sprites and distinct line segments, store
+        the long/lat points of both, and build the spatial index over their
+        bounding boxes.
+        """
+        self._sprites = [drawable for drawable in drawables
+                         if drawable.get_position() is not None]
+        self._lines = LineBatch(drawable.get_linelimits()
+                                for drawable in drawables
+                                if drawable.get_position() is None)
+        locations = []
+        weights = []
+        boxes = []
+        for drawable in self._sprites:
             longlat_position = drawable.get_position()
-            if longlat_position is not None:
-                sprite_position = self._longlat_to_screen(longlat_position)
-                screen.blit(drawable.sprite, sprite_position)
-            else:  # is a line segment
-                endpoints = drawable.get_linelimits()
-                pygame.draw.aaline(screen,
-                                   LINE_COLOUR,
-                                   self._longlat_to_screen(endpoints[0]),
-                                   self._longlat_to_screen(endpoints[1]))
+            locations.append(longlat_position)
+            weights.append(1)
+            boxes.append((longlat_position[0], longlat_position[1],
+                          longlat_position[0], longlat_position[1]))
+        for start, end in self._lines.segments:
+            locations.append(start)
+            locations.append(end)
+            weights.extend((0, 0))
+            boxes.append((min(start[0], end[0]), min(start[1], end[1]),
+                          max(start[0], end[0]), max(start[1], end[1])))
+        self._locations = locations
+        self._weights = weights
+        if numpy is not None:
+            self._locations = numpy.array(locations,
+                                          dtype=float).reshape(-1, 2)
+            self._weights = numpy.array(weights, dtype=float)
+        self._tree = LooseQuadtree(boxes)
+        self._drawn = drawables
+        self._drawn_size = len(drawables)
+        self._positions = None
+        self._heatmap_key = None
+        self._overlay = None
+        self._draft_items = None
+
+    def _get_heatmap(self) -> Optional[pygame.Surface]:
+        """ Return a heatmap of the density of the sprites of the rendered
+        drawables in the current view, or None if few enough calls are
+        visible to render the drawables themselves.
+
+        The heatmap needs NumPy; without it, the drawables are always
+        rendered. It is kept until the view is panned or zoomed.
+        """
+        if numpy is None or len(self._locations) == 0:
+            return None
+        key = (self._zoom, self._xoffset, self._yoffset)
+        if key == self._heatmap_key:
+            return self._heatmap
+        self._heatmap_key = key
+        self._heatmap = None
+
+        points = self._project(self._locations)
+        x, y = points[:, 0], points[:, 1]
+        inside = (x >= 0) & (x < self.screensize[0]) & \
+            (y >= 0) & (y < self.screensize[1])
+        threshold = HEATMAP_THRESHOLD if self._zoom > 1 \
+            else HEATMAP_ZOOMED_OUT_THRESHOLD
+        if numpy.sum(self._weights[inside]) / 2 <= threshold:
+            return None
+
+        size = (self.screensize[0] // HEATMAP_CELL,
+                self.screensize[1] // HEATMAP_CELL)
+        counts, _, _ = numpy.histogram2d(
+            x[inside], y[inside], bins=size,
+            range=((0, self.screensize[0]), (0, self.screensize[1])),
+            weights=self._weights[inside])
+        # Scale the densities logarithmically, so sparse cells stay visible
+        density = numpy.log1p(counts) / numpy.log1p(counts.max())
+        cells = pygame.Surface(size, pygame.SRCALPHA)
+        rgb = pygame.surfarray.pixels3d(cells)
+        for channel in range(3):
+            rgb[:, :, channel] = HEATMAP_LOW[channel] + density * \
+                (HEATMAP_HIGH[channel] - HEATMAP_LOW[channel])
+        del rgb
+        alpha = pygame.surfarray.pixels_alpha(cells)
+        alpha[:, :] = numpy.where(counts > 0, 80 + density * 175, 0)
+        del alpha
+        self._heatmap = pygame.transform.smoothscale(cells, self.screensize)
+        return self._heatmap
+
+    def _visible_region(self) -> Tuple[float, float, float, float]:
+        """ Return the long/lat rectangle shown on the screen, extended by
+        VIEW_MARGIN pixels, as (lower long, lower lat, upper long, upper lat).
+        """
+        width = self.image.get_width()
+        height = self.image.get_height()
+        # The visible part of the image, in image pixels
+        margin_x = VIEW_MARGIN * width / (self._zoom * self.screensize[0])
+        margin_y = VIEW_MARGIN * height / (self._zoom * self.screensize[1])
+        x0 = self._xoffset - margin_x
+        x1 = self._xoffset + width / self._zoom + margin_x
+        y0 = self._yoffset - margin_y
+        y1 = self._yoffset + height / self._zoom + margin_y
+
+        long0, long1 = (self.min_coords[0] + x / width *
+                        (self.max_coords[0] - self.min_coords[0])
+                        for x in (x0, x1))
+        lat0, lat1 = (self.min_coords[1] + y / height *
+                      (self.max_coords[1] - self.min_coords[1])
+                      for y in (y0, y1))
+        return (min(long0, long1), min(lat0, lat1),
+                max(long0, long1), max(lat0, lat1))
+
+    def _project(self, locations: Any,
+                 offset: Optional[Tuple[int, int]] = None) -> Any:
+        """ Convert the NumPy array of long/lat coordinates <locations>, with
+        one point per row, into an array of pixel coordinates, exactly as
+        _longlat_to_screen does for a single point.
+
+        The view is taken to be panned to <offset> instead of the current
+        offsets, if <offset> is not None.
+        """
+        xoffset, yoffset = offset if offset is not None else \
+            (self._xoffset, self._yoffset)
+        width = self.image.get_width()
+        height = self.image.get_height()
+        x = numpy.round((locations[:, 0] - self.min_coords[0]) /
+                        (self.max_coords[0] - self.min_coords[0]) * width)
+        y = numpy.round((locations[:, 1] - self.min_coords[1]) /
+                        (self.max_coords[1] - self.min_coords[1]) * height)
+
+        x = numpy.round((x - xoffset) * self._zoom *
+                        self.screensize[0] / width)
+        y = numpy.round((y - yoffset) * self._zoom *
+                        self.screensize[1] / height)
+        return numpy.stack((x, y), axis=1).astype(int)
 
     def _longlat_to_screen(self,
                            location: Tuple[float, float]) -> Tuple[int, int]:
@@ -417,6 +1268,27 @@ class Map:
         self._zoom += dx
         self._clamp_transformation()
 
+    def show_region(self, lower_long: float, lower_lat: float,
+                    upper_long: float, upper_lat: float) -> None:
+        """ Zoom and pan the view to show the rectangle with the corners
+        (<lower_long>, <lower_lat>) and (<upper_long>, <upper_lat>), as
+        closely as the zoom limits allow.
+        """
+        width = self.image.get_width()
+        height = self.image.get_height()
+        x0, x1 = sorted((long - self.min_coords[0]) /
+                        (self.max_coords[0] - self.min_coords[0]) * width
+                        for long in (lower_long, upper_long))
+        y0, y1 = sorted((lat - self.min_coords[1]) /
+                        (self.max_coords[1] - self.min_coords[1]) * height
+                        for lat in (lower_lat, upper_lat))
+        self._zoom = min(4, max(1, min(width / max(x1 - x0, 1),
+                                       height / max(y1 - y0, 1))))
+        # Centre the rectangle in the view
+        self._xoffset = round((x0 + x1 - width / self._zoom) / 2)
+        self._yoffset = round((y0 + y1 - height / self._zoom) / 2)
+        self._clamp_transformation()
+
     def _clamp_transformation(self) -> None:
         """ Ensure that the transformation parameters are within a fixed range.
         """
@@ -430,15 +1302,23 @@ class Map:
 
     def get_current_view(self) -> pygame.Surface:
         """ Get the subimage to display to screen from the map.
+
+        The scaled subimage is kept until the view is panned or zoomed.
         """
-        raw_width = self.image.get_width()
-        raw_height = self.image.get_height()
-        zoom_width = round(raw_width / self._zoom)
-        zoom_height = round(raw_height / self._zoom)
+        key = (self._zoom, self._xoffset, self._yoffset)
+        if self._view is None or key != self._view_key:
+            self._view = self._scale_view()
+            self._view_key = key
+        return self._view
+
+    def _scale_view(self) -> pygame.Surface:
+        """ Return the subimage of the map for the current transformation,
+        scaled to the screen size.
 
-        mapsegment = self.image.subsurface(((self._xoffset, self._yoffset),
-                                            (zoom_width, zoom_height)))
-        return pygame.transform.smoothscale(mapsegment, self.screensize)
+        The subimage is cropped from the map pre-scaled to the nearest zoom
+        level of the map pyramid.
+        """
+        return self._pyramid.view(self._zoom, self._xoffset, self._yoffset)
 
 
 if __name__ == '__main__':
@@ -446,14 +1326,15 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'allowed-import-modules': [
             'doctest', 'python_ta', 'typing',
-            'tkinter', 'os', 'pygame',
-            'threading', 'math', 'time',
-            'customer', 'call', 'filter',
+            'tkinter', 'os', 'math', 'pygame', 'time', 'numpy',
+            'customer', 'call', 'filter', 'filterpool', 'filtercache',
+            'filterjob', 'spatialindex', 'linebatch', 'framestats',
+            'playback', 'mappyramid'
         ],
         'allowed-io': [
-            'entry_window', 'callback_wrapper', 'threading_wrapper',
-            '__init__', 'handle_window_events'
+            'entry_window', 'callback_wrapper',
+            '__init__', '_handle_events', '_poll_filter'
         ],
-        'disable': ['R0915', 'W0613', 'W0401', 'R0201'],
+        'disable': ['R0915', 'W0613', 'W0401', 'R0201', 'W0703'],
         'generated-members': 'pygame.*'
     })